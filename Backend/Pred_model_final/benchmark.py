@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the symptom-prediction stack.
+
+Generates a reproducible symptom workload from Training.csv rows (random
+subsets, extra noise symptoms, unknown tokens and alternative spellings) and
+measures latency percentiles and throughput for:
+
+- the symptom-match scorers (get_disease_probabilities and friends)
+- the knowledge lookups: helper() and get_disease_info()
+- model inference for every inference backend, single-sample and batched
+- the /predict and /predict/batch routes through the Flask test client
+
+Results are written as JSON; pass --baseline with an earlier file to print
+the change in p50/p99 per benchmark.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from disease_knowledge import DiseaseKnowledge
+from symptom_matcher import SymptomMatcher
+from symptom_vocabulary import SymptomVocabulary
+
+UNKNOWN_SYMPTOMS = ['tingling_toes', 'ear_ringing', 'hair_loss', 'dry_mouth', 'hiccups']
+
+
+def generate_workload(df, size=1000, seed=0, keep=(0.3, 1.0), noise=0.2, unknown=0.1, respell=0.2):
+    """
+    Build a list of patient symptom lists from training rows.
+
+    Args:
+        df (DataFrame): Training data with a 'prognosis' column
+        size (int): Number of symptom lists
+        seed (int): Random seed, the same seed always gives the same workload
+        keep (tuple): Range of the fraction of a row's symptoms to keep
+        noise (float): Probability of adding a random unrelated symptom
+        unknown (float): Probability of adding a symptom outside the vocabulary
+        respell (float): Probability of writing a symptom with spaces and capitals
+
+    Returns:
+        list: Symptom lists
+    """
+    rng = random.Random(seed)
+    columns = [col for col in df.columns if col != 'prognosis']
+    rows = df[columns].to_numpy()
+
+    workload = []
+    for _ in range(size):
+        row = rows[rng.randrange(len(rows))]
+        symptoms = [columns[i] for i in np.flatnonzero(row)]
+        count = max(1, round(len(symptoms) * rng.uniform(*keep)))
+        symptoms = rng.sample(symptoms, count)
+
+        if rng.random() < noise:
+            symptoms.append(rng.choice(columns))
+        if rng.random() < unknown:
+            symptoms.append(rng.choice(UNKNOWN_SYMPTOMS))
+        symptoms = [s.replace('_', ' ').title() if rng.random() < respell else s for s in symptoms]
+        workload.append(symptoms)
+    return workload
+
+
+def measure(func, inputs, warmup=20, items_per_call=1):
+    """
+    Time func(x) for every x in inputs.
+
+    Returns:
+        dict: Latency percentiles in microseconds and throughput per second
+    """
+    for x in inputs[:warmup]:
+        func(x)
+
+    latencies = np.empty(len(inputs))
+    started = time.perf_counter()
+    for i, x in enumerate(inputs):
+        t0 = time.perf_counter()
+        func(x)
+        latencies[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - started
+
+    latencies_us = latencies * 1e6
+    return {
+        'calls': len(inputs),
+        'items_per_call': items_per_call,
+        'mean_us': round(float(latencies_us.mean()), 2),
+        'min_us': round(float(latencies_us.min()), 2),
+        'p50_us': round(float(np.percentile(latencies_us, 50)), 2),
+        'p90_us': round(float(np.percentile(latencies_us, 90)), 2),
+        'p99_us': round(float(np.percentile(latencies_us, 99)), 2),
+        'max_us': round(float(latencies_us.max()), 2),
+        'throughput_per_s': round(len(inputs) * items_per_call / elapsed, 1)
+    }
+
+
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def bench_scorer(df, workload):
+    matcher = SymptomMatcher(df)
+    return {
+        'scorer.disease_probabilities': measure(matcher.disease_probabilities, workload),
+        'scorer.accurate_predictions': measure(matcher.accurate_predictions, workload)
+    }
+
+
+def workload_diseases(df, workload):
+    """Diseases the scorer ranks for the workload, one per request."""
+    matcher = SymptomMatcher(df)
+    return [matcher.disease_probabilities(symptoms)[0]['disease'] for symptoms in workload]
+
+
+def bench_knowledge(diseases):
+    import medicine_recommendation
+
+    knowledge = DiseaseKnowledge.from_csv()
+    return {
+        'knowledge.get': measure(knowledge.get, diseases),
+        'knowledge.helper': measure(medicine_recommendation.helper, diseases)
+    }
+
+
+def bench_models(workload, backends, batch_size):
+    from model_registry import ModelBundle
+    from model_store import load_artifacts
+
+    artifacts = load_artifacts()
+    results = {}
+    for backend in backends:
+        bundle = ModelBundle(artifacts, backend=backend)
+        vocabulary = bundle.vocabulary
+        rows = [vocabulary.vector(symptoms) for symptoms in workload]
+        batches = [np.vstack(chunk) for chunk in chunked(rows, batch_size)]
+
+        for model_type in ('rf', 'svc'):
+            model = bundle.model(model_type)
+            if not hasattr(model, 'predict_proba'):
+                # e.g. an SVC trained without probability estimates
+                continue
+            if backend == 'compiled' and not hasattr(model, 'kind'):
+                # No engine passed its parity check at export, so sklearn would be measured twice
+                print(f"Skipping compiled {model_type}: run `python fast_inference.py` first", file=sys.stderr)
+                continue
+            results[f'model.{backend}.{model_type}.single'] = measure(model.predict_proba, rows)
+            results[f'model.{backend}.{model_type}.batch{batch_size}'] = measure(
+                model.predict_proba, batches, warmup=2, items_per_call=batch_size)
+    return results, artifacts.version
+
+
+def bench_server(workload, diseases, batch_size):
+    # Keep startup side effects out of the measurement
+    os.environ.setdefault('PREDICTION_CACHE_PREWARM', '0')
+    import server
+
+    client = server.create_app(background_tasks=False).test_client()
+    results = {'knowledge.get_disease_info': measure(server.get_disease_info, diseases)}
+
+    def post_predict(symptoms):
+        response = client.post('/predict', json={'symptoms': symptoms})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    def post_batch(batch):
+        response = client.post('/predict/batch', json={'symptoms': batch})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    # Cold: every request misses the cache
+    server.prediction_cache.maxsize = 0
+    results['server.predict.uncached'] = measure(post_predict, workload)
+    results[f'server.predict_batch{batch_size}.uncached'] = measure(
+        post_batch, chunked(workload, batch_size), warmup=2, items_per_call=batch_size)
+
+    # Warm: the same workload again with the cache enabled and filled
+    server.prediction_cache.maxsize = max(len(workload), 1)
+    server.prediction_cache.clear()
+    for symptoms in workload:
+        post_predict(symptoms)
+    server.prediction_cache.reset_counters()
+    results['server.predict.cached'] = measure(post_predict, workload, warmup=0)
+    results['server.predict.cached']['cache'] = server.prediction_cache.stats()
+    return results
+
+
+def compare(results, baseline):
+    """Print the p50/p99 change of every benchmark present in both runs."""
+    print(f"\n{'benchmark':45} {'p50 change':>12} {'p99 change':>12}")
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in ('p50_us', 'p99_us'):
+            ratio = current[key] / previous[key] if previous[key] else float('nan')
+            changes.append(f"{(ratio - 1) * 100:+.1f}%")
+        print(f"{name:45} {changes[0]:>12} {changes[1]:>12}")
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the symptom-prediction stack")
+    parser.add_argument("--requests", type=int, default=1000, help="Symptom lists in the workload")
+    parser.add_argument("--seed", type=int, default=0, help="Workload random seed")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size for batched benchmarks")
+    parser.add_argument("--backends", default="sklearn,compiled", help="Comma-separated inference backends")
+    parser.add_argument("--skip-models", action="store_true", help="Skip model and server benchmarks")
+    parser.add_argument("--skip-server", action="store_true", help="Skip the Flask endpoint benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    df = pd.read_csv('Training.csv')
+    workload = generate_workload(df, size=args.requests, seed=args.seed)
+
+    vocabulary = SymptomVocabulary.from_csv()
+    known = sum(len(vocabulary.indices(symptoms)) for symptoms in workload)
+    total = sum(len(symptoms) for symptoms in workload)
+
+    benchmarks = {}
+    model_version = None
+    benchmarks.update(bench_scorer(df, workload))
+    diseases = workload_diseases(df, workload)
+    benchmarks.update(bench_knowledge(diseases))
+    if not args.skip_models:
+        model_results, model_version = bench_models(workload, args.backends.split(','), args.batch_size)
+        benchmarks.update(model_results)
+        if not args.skip_server:
+            benchmarks.update(bench_server(workload, diseases, args.batch_size))
+
+    import sklearn
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'scikit-learn': sklearn.__version__
+        },
+        'workload': {
+            'requests': args.requests,
+            'seed': args.seed,
+            'batch_size': args.batch_size,
+            'mean_symptoms': round(total / len(workload), 2),
+            'resolved_symptom_ratio': round(known / total, 4)
+        },
+        'model_version': model_version,
+        'benchmarks': benchmarks
+    }
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    print(f"{'benchmark':45} {'p50 us':>10} {'p99 us':>10} {'per second':>12}")
+    for name, stats in benchmarks.items():
+        print(f"{name:45} {stats['p50_us']:>10} {stats['p99_us']:>10} {stats['throughput_per_s']:>12}")
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
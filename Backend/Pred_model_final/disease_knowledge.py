@@ -0,0 +1,97 @@
+import pandas as pd
+
+PRECAUTION_COLUMNS = ['Precaution_1', 'Precaution_2', 'Precaution_3', 'Precaution_4']
+
+
+def _empty_entry():
+    return {
+        "description": "Not available",
+        "precautions": [],
+        "medications": [],
+        "diets": [],
+        "workout": []
+    }
+
+
+def _clean(values):
+    """Drop NaNs and keep the remaining values in their original order."""
+    return [value for value in values if not pd.isna(value)]
+
+
+class DiseaseKnowledge:
+    """
+    In-memory index of the description, precautions, medications, diets and
+    workout tables, keyed by disease name.
+
+    The CSVs are grouped once when the index is built, so every lookup is a
+    single dictionary access and no pandas work happens per request. Entries
+    hold plain lists with NaNs dropped and the four precaution columns
+    flattened into one list.
+    """
+
+    def __init__(self, description, precautions, medications, diets, workout):
+        self._entries = {}
+
+        for disease, rows in description.groupby('Disease', sort=False):
+            self._entry(disease)["description"] = " ".join(_clean(rows['Description']))
+
+        for disease, rows in precautions.groupby('Disease', sort=False):
+            self._entry(disease)["precautions"] = _clean(rows[PRECAUTION_COLUMNS].values.flatten())
+
+        for disease, rows in medications.groupby('Disease', sort=False):
+            self._entry(disease)["medications"] = _clean(rows['Medication'])
+
+        for disease, rows in diets.groupby('Disease', sort=False):
+            self._entry(disease)["diets"] = _clean(rows['Diet'])
+
+        for disease, rows in workout.groupby('disease', sort=False):
+            self._entry(disease)["workout"] = _clean(rows['workout'])
+
+    def _entry(self, disease):
+        if disease not in self._entries:
+            self._entries[disease] = _empty_entry()
+        return self._entries[disease]
+
+    @classmethod
+    def from_csv(cls, data_dir='.'):
+        """
+        Build the index from the knowledge CSVs.
+
+        Args:
+            data_dir (str): Directory holding the CSV files
+
+        Returns:
+            DiseaseKnowledge: The populated index
+        """
+        def read(name):
+            return pd.read_csv(f"{data_dir}/{name}")
+
+        return cls(
+            description=read('description.csv'),
+            precautions=read('precautions_df.csv'),
+            medications=read('medications.csv'),
+            diets=read('diets.csv'),
+            workout=read('workout_df.csv')
+        )
+
+    def __contains__(self, disease):
+        return disease in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, disease):
+        """
+        Look up everything known about a disease.
+
+        The returned dictionary is shared by all callers and must not be
+        modified; unknown diseases get a fresh placeholder entry.
+
+        Args:
+            disease (str): Disease name as produced by the models
+
+        Returns:
+            dict: 'description', 'precautions', 'medications', 'diets' and 'workout'
+        """
+        entry = self._entries.get(disease)
+        return entry if entry is not None else _empty_entry()
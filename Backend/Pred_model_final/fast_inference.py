@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Flattened inference engines for the symptom classifiers.
+
+compile_forest() turns a fitted RandomForestClassifier into one set of
+contiguous node arrays covering every tree, and compile_svc() turns a fitted
+linear SVC into its one-vs-one decision matrix plus Platt-scaling
+parameters. The engines only need NumPy at prediction time and expose the
+same predict_proba / feature_names_in_ interface as the sklearn models, so
+server.py can swap them in as a backend.
+
+Run `python fast_inference.py` to check the engines of a trained version
+against sklearn and export the ones that pass next to its artifacts. The
+parity results and the SHA-256 of every exported file are recorded in the
+version's metadata.json, and load_engines() only loads engines recorded as
+passing.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+from model_store import LEGACY_VERSION, METADATA_FILE, file_sha256, write_metadata
+
+logger = logging.getLogger(__name__)
+
+RF_ENGINE_FILE = 'rf_engine.npz'
+SVC_ENGINE_FILE = 'svc_engine.npz'
+
+# Exported engines and the largest probability difference each may show against sklearn
+ENGINE_TARGETS = (('rf', RF_ENGINE_FILE, 1e-9), ('svc', SVC_ENGINE_FILE, 1e-3))
+
+# Lower bound libsvm applies to pairwise probabilities
+MIN_PAIRWISE_PROB = 1e-7
+
+
+class ForestEngine:
+    """Random Forest evaluated over flattened node arrays."""
+
+    kind = 'forest'
+
+    def __init__(self, left, right, feature, threshold, values, roots, depth, feature_names, classes):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.values = values
+        self.roots = roots
+        self.depth = int(depth)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+
+        # Leaves point back at themselves, so walking a fixed depth is safe
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.values[leaves].sum(axis=1) / len(self.roots)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class LinearSVCEngine:
+    """Linear one-vs-one SVC with libsvm-style pairwise probability coupling."""
+
+    kind = 'svc'
+
+    def __init__(self, coef, intercept, prob_a, prob_b, pairs, feature_names, classes):
+        self.coef_t = np.ascontiguousarray(coef.T)
+        self.intercept = intercept
+        self.prob_a = prob_a
+        self.prob_b = prob_b
+        self.pairs = pairs
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    def decision_function(self, X):
+        """One-vs-one decision values, shape (n_samples, n_pairs)."""
+        return np.asarray(X, dtype=np.float64) @ self.coef_t + self.intercept
+
+    def predict_proba(self, X):
+        """
+        Class probabilities from Platt-scaled pairwise decisions.
+
+        The pairwise estimates are coupled by solving the Wu, Lin and Weng
+        quadratic problem directly; libsvm iterates towards the same optimum
+        and stops within 0.005 / n_classes of it.
+        """
+        decision = self.decision_function(X)
+        pairwise = 1.0 / (1.0 + np.exp(decision * self.prob_a + self.prob_b))
+        pairwise = np.clip(pairwise, MIN_PAIRWISE_PROB, 1 - MIN_PAIRWISE_PROB)
+
+        n_samples, n_classes = decision.shape[0], len(self.classes_)
+        i, j = self.pairs[:, 0], self.pairs[:, 1]
+        r = np.zeros((n_samples, n_classes, n_classes))
+        r[:, i, j] = pairwise
+        r[:, j, i] = 1 - pairwise
+
+        # Q[t][t] = sum_j r[j][t]^2, Q[t][j] = -r[j][t] * r[t][j]
+        system = np.zeros((n_samples, n_classes + 1, n_classes + 1))
+        squared = r ** 2
+        q = -np.transpose(r, (0, 2, 1)) * r
+        diag = np.arange(n_classes)
+        q[:, diag, diag] = squared.sum(axis=1)
+        system[:, :n_classes, :n_classes] = q
+        system[:, :n_classes, n_classes] = 1
+        system[:, n_classes, :n_classes] = 1
+
+        rhs = np.zeros((n_samples, n_classes + 1, 1))
+        rhs[:, n_classes] = 1
+        return np.linalg.solve(system, rhs)[:, :n_classes, 0]
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compile_forest(rf_model):
+    """
+    Flatten every tree of a fitted forest into shared node arrays.
+
+    Args:
+        rf_model: Fitted sklearn RandomForestClassifier
+
+    Returns:
+        ForestEngine: Engine evaluating the same trees
+    """
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+
+        # Per-tree class fractions, as DecisionTreeClassifier.predict_proba returns them
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        depth = max(depth, tree.max_depth)
+        offset += tree.node_count
+
+    return ForestEngine(
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        values=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        depth=depth,
+        feature_names=rf_model.feature_names_in_,
+        classes=rf_model.classes_
+    )
+
+
+def compile_svc(svc_model):
+    """
+    Extract the one-vs-one decision matrix of a fitted linear SVC.
+
+    Args:
+        svc_model: Fitted sklearn SVC with kernel='linear' and probability=True
+
+    Returns:
+        LinearSVCEngine: Engine evaluating the same decision functions
+    """
+    if svc_model.kernel != 'linear':
+        raise ValueError("Only linear SVC models can be compiled")
+    if not svc_model.probability or len(svc_model.probA_) == 0:
+        raise ValueError("SVC must be trained with probability=True, retrain with train.py")
+
+    n_classes = len(svc_model.classes_)
+    pairs = np.array([(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)], dtype=np.intp)
+    return LinearSVCEngine(
+        coef=np.asarray(svc_model.coef_, dtype=np.float64),
+        intercept=np.asarray(svc_model.intercept_, dtype=np.float64),
+        prob_a=np.asarray(svc_model.probA_, dtype=np.float64),
+        prob_b=np.asarray(svc_model.probB_, dtype=np.float64),
+        pairs=pairs,
+        feature_names=svc_model.feature_names_in_,
+        classes=svc_model.classes_
+    )
+
+
+def save_engine(engine, path):
+    """Write an engine's arrays to a .npz file."""
+    common = {
+        'kind': np.array(engine.kind),
+        'feature_names': np.asarray(engine.feature_names_in_, dtype=str),
+        'classes': engine.classes_
+    }
+    if engine.kind == 'forest':
+        np.savez(path, left=engine.left, right=engine.right, feature=engine.feature,
+                 threshold=engine.threshold, values=engine.values, roots=engine.roots,
+                 depth=np.array(engine.depth), **common)
+    else:
+        np.savez(path, coef=engine.coef_t.T, intercept=engine.intercept, prob_a=engine.prob_a,
+                 prob_b=engine.prob_b, pairs=engine.pairs, **common)
+
+
+def load_engine(path):
+    """Load an engine written by save_engine()."""
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data['kind'])
+        common = {'feature_names': list(data['feature_names']), 'classes': data['classes']}
+        if kind == 'forest':
+            return ForestEngine(data['left'], data['right'], data['feature'], data['threshold'],
+                                data['values'], data['roots'], data['depth'], **common)
+        return LinearSVCEngine(data['coef'], data['intercept'], data['prob_a'], data['prob_b'],
+                               data['pairs'], **common)
+
+
+def load_engines(artifacts):
+    """
+    Load the exported engines of an artifact set that passed their parity check.
+
+    An engine is only loaded when metadata.json records a passing parity
+    check for it and its .npz file still matches the recorded SHA-256.
+    Nothing is compiled on the fly: models without a verified engine are
+    returned as None and served by sklearn.
+
+    Args:
+        artifacts (ModelArtifacts): Output of model_store.load_artifacts()
+
+    Returns:
+        tuple: (rf engine or None, svc engine or None)
+    """
+    compiled = artifacts.metadata.get('compiled', {})
+    engines = []
+    for name, filename, _ in ENGINE_TARGETS:
+        record = compiled.get(name)
+        path = os.path.join(artifacts.path, filename)
+        if not record or not record.get('parity_passed'):
+            logger.warning(f"No passing parity check recorded for the {name} engine of version "
+                           f"{artifacts.version}, run `python fast_inference.py`")
+            engines.append(None)
+        elif not os.path.exists(path) or file_sha256(path) != record.get('sha256'):
+            logger.warning(f"Exported {name} engine {path} is missing or does not match its checksum")
+            engines.append(None)
+        else:
+            engines.append(load_engine(path))
+    return tuple(engines)
+
+
+def check_parity(model, engine, X, atol):
+    """
+    Compare engine and sklearn probabilities on the same inputs.
+
+    Returns:
+        tuple: (max absolute difference, fraction of rows with the same argmax, passed)
+    """
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X)
+    max_diff = float(np.abs(expected - actual).max())
+    same_top = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    return max_diff, same_top, max_diff <= atol
+
+
+def parity_inputs(features, data_path='Training.csv', random_rows=500, seed=0):
+    """Unique training rows plus random sparse symptom vectors."""
+    import pandas as pd
+    training = pd.read_csv(data_path)[features].drop_duplicates().to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    random_rows = (rng.random((random_rows, len(features))) < 0.04).astype(np.float64)
+    return np.vstack([training, random_rows])
+
+
+def export_engines(artifacts, data_path='Training.csv'):
+    """
+    Compile, parity-check and export the engines of a versioned artifact set.
+
+    Engines that match sklearn within their tolerance are written next to the
+    artifacts. Every result is recorded under 'compiled' in metadata.json,
+    and exported files are added to its checksum manifest. An engine that
+    fails the check (or cannot be compiled) is not written, and a stale
+    export of it is removed.
+
+    Args:
+        artifacts (ModelArtifacts): Output of model_store.load_artifacts()
+        data_path (str): Training CSV used for parity inputs
+
+    Returns:
+        dict: The parity record of each engine
+    """
+    import pandas as pd
+    X = pd.DataFrame(parity_inputs(artifacts.features, data_path), columns=artifacts.features)
+    compilers = {'rf': (artifacts.rf_model, compile_forest), 'svc': (artifacts.svc_model, compile_svc)}
+
+    metadata = artifacts.metadata
+    files = metadata.setdefault('files', {})
+    compiled = metadata.setdefault('compiled', {})
+    for name, filename, atol in ENGINE_TARGETS:
+        model, compile_model = compilers[name]
+        path = os.path.join(artifacts.path, filename)
+        record = {'file': filename, 'parity_passed': False, 'tolerance': atol, 'rows': len(X),
+                  'checked_at': datetime.now(timezone.utc).isoformat()}
+        try:
+            engine = compile_model(model)
+        except ValueError as e:
+            record['error'] = str(e)
+        else:
+            max_diff, same_top, passed = check_parity(model, engine, X, atol)
+            record.update(parity_passed=passed, max_abs_diff=max_diff, same_top_class=same_top)
+            if passed:
+                save_engine(engine, path)
+                record['sha256'] = files[filename] = file_sha256(path)
+
+        if not record['parity_passed']:
+            files.pop(filename, None)
+            if os.path.exists(path):
+                os.remove(path)
+        compiled[name] = record
+
+    write_metadata(artifacts.path, metadata)
+    return compiled
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    from model_store import MODEL_DIR
+    parser = argparse.ArgumentParser(description="Export and verify compiled inference engines")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Artifact root directory")
+    parser.add_argument("--version", help="Model version (default: LATEST)")
+    parser.add_argument("--data", default="Training.csv", help="Training CSV used for parity inputs")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    from model_store import load_artifacts
+
+    args = parse_arguments()
+    artifacts = load_artifacts(args.model_dir, version=args.version)
+    if artifacts.version == LEGACY_VERSION:
+        print("Error: compiled engines need a versioned model, run `python train.py` first", file=sys.stderr)
+        return 1
+
+    ok = True
+    for name, record in export_engines(artifacts, args.data).items():
+        if 'error' in record:
+            print(f"{name}: skipped ({record['error']})")
+            continue
+        print(f"{name}: max |p - p_sklearn| = {record['max_abs_diff']:.2e}, same top class on "
+              f"{record['same_top_class']:.1%} of {record['rows']} rows")
+        if record['parity_passed']:
+            print(f"{name}: wrote {os.path.join(artifacts.path, record['file'])}")
+        else:
+            print(f"{name}: parity check FAILED (tolerance {record['tolerance']}), not exported")
+            ok = False
+    print(f"Recorded parity results in {os.path.join(artifacts.path, METADATA_FILE)}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Production serving configuration for the disease prediction server.
+
+Run from this directory with:
+
+    gunicorn -c gunicorn.conf.py
+
+The app is built once in the master process (preload_app), so the models,
+knowledge index and prediction cache are loaded before forking and shared
+copy-on-write by every worker. Each worker then starts its own watcher for
+new model versions, since threads do not survive fork, and reloads the
+LATEST version on SIGHUP (`kill -HUP <worker pid>`; a SIGHUP to the master
+is gunicorn's own graceful restart).
+
+Environment:
+    BIND                   Address to listen on (default 0.0.0.0:5000)
+    WEB_CONCURRENCY        Worker processes (default: CPU count, at most 8)
+    GUNICORN_THREADS       Threads per worker (default 4)
+    GUNICORN_TIMEOUT       Seconds before a silent worker is restarted (default 60)
+    GUNICORN_GRACEFUL      Seconds workers get to finish requests on shutdown (default 30)
+"""
+
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "server:create_app(background_tasks=False)"
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# Load models once in the master and fork workers from it
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL", 30))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers do not touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Not post_fork: the worker resets SIGHUP in init_signals() after that
+    # hook, which would drop the model reload handler again
+    import server as prediction_server
+    prediction_server.start_background_tasks()
+
+
+def worker_exit(server, worker):
+    import server as prediction_server
+    prediction_server.stop_background_tasks()
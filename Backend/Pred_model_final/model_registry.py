@@ -0,0 +1,158 @@
+import logging
+import signal
+import threading
+
+import numpy as np
+
+from fast_inference import load_engines
+from model_store import MODEL_DIR, latest_version, load_artifacts
+from symptom_vocabulary import SymptomVocabulary
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('sklearn', 'compiled')
+
+
+class ModelBundle:
+    """
+    One loaded model version with everything a request needs.
+
+    Bundles are never modified after construction. A request takes the
+    registry's current bundle once and uses it to the end, so swapping in a
+    new version never changes models under an in-flight request.
+    """
+
+    def __init__(self, artifacts, backend='sklearn'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend!r}, use one of {BACKENDS}")
+
+        self.version = artifacts.version
+        self.artifacts = artifacts
+        self.backend = backend
+        self.label_encoder = artifacts.label_encoder
+        self.vocabulary = SymptomVocabulary(artifacts.features)
+
+        self.models = {'rf': artifacts.rf_model, 'svc': artifacts.svc_model}
+        if backend == 'compiled':
+            # Only engines that passed their parity check at export replace sklearn
+            for model_type, engine in zip(('rf', 'svc'), load_engines(artifacts)):
+                if engine is not None:
+                    self.models[model_type] = engine
+
+        for model in self.models.values():
+            if list(model.feature_names_in_) != self.vocabulary.features:
+                raise ValueError(f"Model feature order does not match model version {self.version}")
+
+    def model(self, model_type):
+        return self.models['rf'] if model_type == 'rf' else self.models['svc']
+
+    def warm_up(self, samples=8, seed=0):
+        """Run a few synthetic predictions so first requests skip lazy initialization."""
+        rng = np.random.default_rng(seed)
+        X = (rng.random((samples, len(self.vocabulary))) < 0.05).astype(np.float64)
+        for model_type, model in self.models.items():
+            try:
+                model.predict_proba(X[:1])
+                model.predict_proba(X)
+            except AttributeError as e:
+                # e.g. an SVC trained without probability estimates
+                logger.warning(f"Skipping warm-up for {model_type} of version {self.version}: {e}")
+        self.label_encoder.inverse_transform([0])
+
+
+class ModelRegistry:
+    """
+    Holds the serving ModelBundle and swaps in new versions without downtime.
+
+    New versions are loaded and warmed up off the request path, then published
+    with a single reference assignment. Reloads happen when LATEST changes
+    (polling), on SIGHUP, or when reload() is called directly.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, backend='sklearn', on_swap=None):
+        self.model_dir = model_dir
+        self.backend = backend
+        self.on_swap = on_swap
+        self._current = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def current(self):
+        """The bundle serving new requests."""
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version if self._current else None
+
+    def load(self, version=None):
+        """Load and warm up a version without publishing it."""
+        bundle = ModelBundle(load_artifacts(self.model_dir, version=version), backend=self.backend)
+        bundle.warm_up()
+        return bundle
+
+    def reload(self, version=None, force=False):
+        """
+        Load a version (default LATEST) and swap it in once it is warm.
+
+        Args:
+            version (str, optional): Version to serve, defaults to LATEST
+            force (bool): Reload even if the version is already serving
+
+        Returns:
+            bool: True if a new bundle was published
+        """
+        with self._reload_lock:
+            target = version or latest_version(self.model_dir)
+            if self._current is not None and not force and target is not None and target == self.version:
+                return False
+
+            try:
+                bundle = self.load(target)
+            except Exception as e:
+                logger.error(f"Failed to load model version {target}, keeping {self.version}: {e}")
+                if self._current is None:
+                    raise
+                return False
+
+            previous, self._current = self._current, bundle
+            logger.info(f"Serving model version {bundle.version} (was {previous.version if previous else None})")
+
+            # Still under the lock, so concurrent reloads see their swaps in order
+            if self.on_swap:
+                self.on_swap(bundle, previous)
+        return True
+
+    def reload_async(self, version=None, force=False):
+        """Reload on a background thread and return immediately."""
+        thread = threading.Thread(target=self.reload, args=(version, force), daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            target = latest_version(self.model_dir)
+            if target is not None and target != self.version:
+                self.reload(target)
+
+    def start_watching(self, interval=30):
+        """Poll LATEST every interval seconds and reload when it moves."""
+        if self._watcher is None and interval > 0:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self._watcher.start()
+
+    def install_signal_handler(self, signum=getattr(signal, 'SIGHUP', None)):
+        """Reload in the background when the process receives signum (SIGHUP by default)."""
+        if signum is None:
+            return False
+        try:
+            signal.signal(signum, lambda *_: self.reload_async())
+        except ValueError:
+            # Signal handlers can only be installed from the main thread
+            return False
+        return True
+
+    def stop(self):
+        self._stop.set()
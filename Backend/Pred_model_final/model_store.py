@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+
+import joblib
+
+# Root directory holding one sub-directory per trained version
+MODEL_DIR = os.environ.get('MODEL_DIR', 'models')
+
+# File inside MODEL_DIR naming the version to serve
+LATEST_FILE = 'LATEST'
+METADATA_FILE = 'metadata.json'
+
+RF_MODEL_FILE = 'rf_model.pkl'
+SVC_MODEL_FILE = 'svc.pkl'
+LABEL_ENCODER_FILE = 'label_encoder.pkl'
+
+# Version reported for the flat pickles shipped next to server.py
+LEGACY_VERSION = 'legacy'
+
+
+class ArtifactError(Exception):
+    """Raised when model artifacts are missing or fail verification."""
+
+
+class ModelArtifacts:
+    """Everything the servers need from one trained version."""
+
+    def __init__(self, version, rf_model, svc_model, label_encoder, features, metadata, path):
+        self.version = version
+        self.rf_model = rf_model
+        self.svc_model = svc_model
+        self.label_encoder = label_encoder
+        self.features = list(features)
+        self.metadata = metadata
+        self.path = path
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def latest_version(model_dir=MODEL_DIR):
+    """
+    Read the version currently marked as latest.
+
+    Args:
+        model_dir (str): Root artifact directory
+
+    Returns:
+        str: Version name, or None if nothing has been trained yet
+    """
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def mark_latest(version, model_dir=MODEL_DIR):
+    """Atomically point LATEST at a version."""
+    tmp_path = os.path.join(model_dir, LATEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as file:
+        file.write(version + '\n')
+    os.replace(tmp_path, os.path.join(model_dir, LATEST_FILE))
+
+
+def read_metadata(version, model_dir=MODEL_DIR):
+    with open(os.path.join(model_dir, version, METADATA_FILE)) as file:
+        return json.load(file)
+
+
+def write_metadata(path, metadata):
+    """Atomically replace the metadata.json of the version directory at path."""
+    tmp_path = os.path.join(path, METADATA_FILE + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(tmp_path, os.path.join(path, METADATA_FILE))
+
+
+def _load_versioned(version, model_dir, verify):
+    path = os.path.join(model_dir, version)
+    try:
+        metadata = read_metadata(version, model_dir)
+    except FileNotFoundError:
+        raise ArtifactError(f"No metadata for model version {version} in {model_dir}")
+
+    # Refuse to serve files that do not match what training wrote
+    if verify:
+        for name, expected in metadata['files'].items():
+            file_path = os.path.join(path, name)
+            if not os.path.exists(file_path):
+                raise ArtifactError(f"Missing artifact {file_path}")
+            if file_sha256(file_path) != expected:
+                raise ArtifactError(f"Checksum mismatch for {file_path}")
+
+    return ModelArtifacts(
+        version=version,
+        rf_model=joblib.load(os.path.join(path, RF_MODEL_FILE)),
+        svc_model=joblib.load(os.path.join(path, SVC_MODEL_FILE)),
+        label_encoder=joblib.load(os.path.join(path, LABEL_ENCODER_FILE)),
+        features=metadata['features'],
+        metadata=metadata,
+        path=path
+    )
+
+
+def _load_legacy(legacy_dir):
+    try:
+        rf_model = joblib.load(os.path.join(legacy_dir, RF_MODEL_FILE))
+        svc_model = joblib.load(os.path.join(legacy_dir, SVC_MODEL_FILE))
+        label_encoder = joblib.load(os.path.join(legacy_dir, LABEL_ENCODER_FILE))
+    except FileNotFoundError as e:
+        raise ArtifactError(f"No trained models found, run `python train.py` first ({e})")
+
+    return ModelArtifacts(
+        version=LEGACY_VERSION,
+        rf_model=rf_model,
+        svc_model=svc_model,
+        label_encoder=label_encoder,
+        features=rf_model.feature_names_in_,
+        metadata={'version': LEGACY_VERSION},
+        path=legacy_dir
+    )
+
+
+def load_artifacts(model_dir=MODEL_DIR, version=None, verify=True, legacy_dir='.'):
+    """
+    Load a trained version without fitting anything.
+
+    Falls back to the flat rf_model.pkl / svc.pkl / label_encoder.pkl next to
+    the server when no versioned artifacts exist yet.
+
+    Args:
+        model_dir (str): Root artifact directory written by train.py
+        version (str, optional): Version to load, defaults to LATEST
+        verify (bool): Check file checksums against the metadata
+        legacy_dir (str): Directory holding the unversioned pickles
+
+    Returns:
+        ModelArtifacts: Loaded models, label encoder, feature order and metadata
+    """
+    version = version or latest_version(model_dir)
+    if version is None:
+        return _load_legacy(legacy_dir)
+    return _load_versioned(version, model_dir, verify)
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with per-entry TTL for /predict payloads.
+
+    Keys are (model_type, sorted tuple of feature indices), so every spelling
+    of the same symptom set shares one entry. The cache is bound to a model
+    version and empties itself as soon as a different version is bound.
+    Cached values are shared between requests and must not be modified.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_type, feature_indices):
+        return model_type, tuple(sorted(feature_indices))
+
+    def bind(self, version):
+        """
+        Attach the cache to a model version, clearing it if the version changed.
+
+        Returns:
+            bool: True if existing entries were invalidated
+        """
+        with self._lock:
+            if version == self.version:
+                return False
+            changed = self.version is not None
+            self.version = version
+            self._entries.clear()
+            return changed
+
+    def get(self, key, version=None):
+        """
+        Return the cached value for key, or None on a miss or expiry.
+
+        Args:
+            key: Key from make_key()
+            version (str, optional): Model version the caller predicts with;
+                while the cache is bound to any other version every lookup
+                misses, so a request never gets a payload of another version
+        """
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if version is not None and version != self.version:
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        """
+        Store a value, evicting the least recently used entries when full.
+
+        Args:
+            key: Key from make_key()
+            value: Payload to cache
+            version (str, optional): Model version that produced the value;
+                values from any other version than the bound one are dropped
+        """
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for the /cache/stats endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -1,69 +1,105 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS  # ✅ Import CORS
-import joblib
-import pandas as pd
+import os
+import logging
+import threading
+from itertools import combinations
 import numpy as np
+from disease_knowledge import DiseaseKnowledge
+from healthcare_common.metrics import REGISTRY, instrument_app, stage
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
 
-# Load the trained models
-rf_model = joblib.load("rf_model.pkl")
-svc_model = joblib.load("svc.pkl")
-label_encoder = joblib.load("label_encoder.pkl")
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Load additional datasets
-description = pd.read_csv("description.csv")
-precautions = pd.read_csv("precautions_df.csv")
-medications = pd.read_csv("medications.csv")
-diets = pd.read_csv("diets.csv")
-workout = pd.read_csv("workout_df.csv")
+_state_lock = threading.Lock()
 
-# Flask app
-app = Flask(__name__)
-CORS(app)  # ✅ Enable CORS for all routes
+# Shared state, loaded once per process by load_state(). With a preloading
+# multi-worker server this happens in the parent, and forked workers share
+# the loaded models and tables copy-on-write.
+knowledge = None
+prediction_cache = None
+registry = None
+
+# Disease predictions are served from this blueprint
+predict_bp = Blueprint('predict', __name__)
+
+# Cache counters are read from prediction_cache.stats() when /metrics is scraped
+REGISTRY.register_stats(
+    'prediction_cache',
+    lambda: prediction_cache.stats() if prediction_cache is not None else None,
+    counters=('hits', 'misses', 'evictions'),
+    gauges=('size', 'maxsize', 'hit_ratio')
+)
+
+def on_model_swap(bundle, previous):
+    # Cached payloads belong to the old version
+    prediction_cache.bind(bundle.version)
+    if os.environ.get("PREDICTION_CACHE_PREWARM", "0") == "1":
+        prewarm_cache(bundle)
+
+def load_state():
+    """Load the knowledge index and the serving model version (idempotent)."""
+    global knowledge, prediction_cache, registry
+
+    with _state_lock:
+        if registry is not None:
+            return
+
+        # Load additional datasets into a disease-keyed index
+        knowledge = DiseaseKnowledge.from_csv()
+
+        # Cache of /predict payloads keyed on (model_type, canonical symptom set)
+        prediction_cache = PredictionCache(
+            maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", 20000)),
+            ttl=float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+        )
+
+        # Serve models written by train.py; new versions are warmed up and swapped in live.
+        # INFERENCE_BACKEND is "sklearn" or "compiled" (flattened NumPy engines from fast_inference.py)
+        new_registry = ModelRegistry(
+            backend=os.environ.get("INFERENCE_BACKEND", "sklearn"),
+            on_swap=on_model_swap
+        )
+        new_registry.reload()
+        registry = new_registry
+
+def start_background_tasks():
+    """Follow LATEST (and SIGHUP, where possible) for new model versions."""
+    registry.start_watching(float(os.environ.get("MODEL_POLL_INTERVAL", 30)))
+    registry.install_signal_handler()
+
+def stop_background_tasks():
+    if registry is not None:
+        registry.stop()
+
+def is_ready():
+    return registry is not None and registry.current is not None
 
 def get_disease_info(disease):
-    desc = description[description['Disease'] == disease]['Description'].values
-    pre = precautions[precautions['Disease'] == disease][['Precaution_1', 'Precaution_2', 'Precaution_3', 'Precaution_4']].values.flatten()
-    med = medications[medications['Disease'] == disease]['Medication'].values
-    diet = diets[diets['Disease'] == disease]['Diet'].values
-    wrk = workout[workout['disease'] == disease]['workout'].values
-    
-    return {
-        "description": desc[0] if len(desc) > 0 else "Not available",
-        "precautions": list(pre[~pd.isna(pre)]) if len(pre) > 0 else [],
-        "medications": list(med) if len(med) > 0 else [],
-        "diets": list(diet) if len(diet) > 0 else [],
-        "workout": list(wrk) if len(wrk) > 0 else []
-    }
+    return knowledge.get(disease)
 
-# API Route for disease prediction
-@app.route('/predict', methods=['POST'])
-def predict_disease():
-    data = request.json
-    symptoms = data.get("symptoms", [])
-    model_type = data.get("model_type", "rf")  # Default to Random Forest
-    
-    if not symptoms:
-        return jsonify({"error": "No symptoms provided"}), 400
-    
-    # Select the model
-    model = rf_model if model_type == "rf" else svc_model
-    
-    # Convert symptoms to feature vector
-    input_vector = np.zeros(len(model.feature_names_in_))
-    for symptom in symptoms:
-        if symptom in model.feature_names_in_:
-            input_vector[model.feature_names_in_.tolist().index(symptom)] = 1
-    
-    input_vector = input_vector.reshape(1, -1)
-    probabilities = model.predict_proba(input_vector)[0]
+# Largest number of symptom lists accepted by /predict/batch
+MAX_BATCH_SIZE = 5000
+
+def is_symptom_list(symptoms):
+    return isinstance(symptoms, list) and all(isinstance(symptom, str) for symptom in symptoms)
+
+def get_model_name(model_type):
+    return "Random Forest" if model_type == "rf" else "SVC"
+
+def build_predictions(bundle, probabilities):
+    """Turn one row of class probabilities into the top-3 response payload."""
     top_disease_indices = np.argsort(probabilities)[-3:][::-1]  # Get top 3 diseases
-    
+    disease_names = bundle.label_encoder.inverse_transform(top_disease_indices)
+
     diseases = []
     probabilities_list = []
     general_details = {"description": [], "diets": [], "medications": [], "precautions": [], "workout": []}
 
-    for idx in top_disease_indices:
-        disease_name = label_encoder.inverse_transform([idx])[0]
+    for idx, disease_name in zip(top_disease_indices, disease_names):
         disease_info = get_disease_info(disease_name)
 
         diseases.append(disease_name)
@@ -79,17 +115,186 @@ def predict_disease():
 
     # Remove duplicates in lists
     for key in general_details:
-        general_details[key] = list(set(general_details[key]))  
-
-    return jsonify({
-        "model_used": "Random Forest" if model_type == "rf" else "SVC",
-        "predictions": {
-            "diseases": diseases,
-            "probabilities": probabilities_list,
-            "general_details": general_details
-        }
-    })
-
-# Run Flask app
+        general_details[key] = list(set(general_details[key]))
+
+    return {
+        "diseases": diseases,
+        "probabilities": probabilities_list,
+        "general_details": general_details
+    }
+
+def predict_feature_sets(bundle, model_type, feature_sets):
+    """
+    Predict payloads for many feature index lists, serving repeats from the cache.
+
+    All cache misses go through one feature matrix and one predict_proba call.
+
+    Args:
+        bundle (ModelBundle): Model version to predict with
+        model_type (str): "rf" or anything else for the SVC
+        feature_sets (list): Lists of feature indices, one per patient
+
+    Returns:
+        list: Prediction payloads in input order
+    """
+    model_key = "rf" if model_type == "rf" else "svc"
+    with stage("cache_lookup"):
+        keys = [prediction_cache.make_key(model_key, indices) for indices in feature_sets]
+        results = [prediction_cache.get(key, version=bundle.version) for key in keys]
+
+    # Group misses so repeated symptom sets are only predicted once
+    missing = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], []).append(i)
+
+    if missing:
+        missing_keys = list(missing)
+        input_matrix = np.zeros((len(missing_keys), len(bundle.vocabulary)))
+        for row, key in enumerate(missing_keys):
+            input_matrix[row, list(key[1])] = 1
+        with stage("model"):
+            probabilities = bundle.model(model_type).predict_proba(input_matrix)
+
+        with stage("build_payload"):
+            for row, key in enumerate(missing_keys):
+                payload = build_predictions(bundle, probabilities[row])
+                prediction_cache.put(key, payload, version=bundle.version)
+                for i in missing[key]:
+                    results[i] = payload
+
+    return results
+
+def prewarm_cache(bundle, chunk_size=2048):
+    """Fill the cache with every single symptom and every symptom pair."""
+    feature_count = len(bundle.vocabulary)
+    feature_sets = [[i] for i in range(feature_count)]
+    feature_sets += [list(pair) for pair in combinations(range(feature_count), 2)]
+
+    for model_type in ("rf", "svc"):
+        try:
+            for start in range(0, len(feature_sets), chunk_size):
+                predict_feature_sets(bundle, model_type, feature_sets[start:start + chunk_size])
+        except AttributeError as e:
+            # e.g. an SVC trained without probability estimates
+            logger.warning(f"Skipping cache pre-warm for {model_type}: {e}")
+            continue
+        logger.info(f"Pre-warmed prediction cache for {model_type} with {len(feature_sets)} symptom sets")
+
+    # Warm-up lookups are not traffic
+    prediction_cache.reset_counters()
+
+# API Route for disease prediction
+@predict_bp.route('/predict', methods=['POST'])
+def predict_disease():
+    data = request.json
+    symptoms = data.get("symptoms", [])
+    model_type = data.get("model_type", "rf")  # Default to Random Forest
+    
+    if not symptoms:
+        return jsonify({"error": "No symptoms provided"}), 400
+    if not is_symptom_list(symptoms):
+        return jsonify({"error": "Symptoms must be a list of strings"}), 400
+    if not is_ready():
+        return jsonify({"error": "Models are still loading"}), 503
+    
+    # Pin one model version for the whole request
+    bundle = registry.current
+
+    # Resolve symptoms to their canonical feature set and predict (or hit the cache)
+    with stage("resolve_symptoms"):
+        feature_set = bundle.vocabulary.indices(symptoms)
+    predictions = predict_feature_sets(bundle, model_type, [feature_set])[0]
+
+    with stage("serialize"):
+        return jsonify({
+            "model_used": get_model_name(model_type),
+            "model_version": bundle.version,
+            "predictions": predictions
+        })
+
+# API Route for predicting many symptom lists in one model call
+@predict_bp.route('/predict/batch', methods=['POST'])
+def predict_disease_batch():
+    data = request.json or {}
+    batch = data.get("symptoms", [])
+    model_type = data.get("model_type", "rf")  # Default to Random Forest
+
+    if not batch or not isinstance(batch, list):
+        return jsonify({"error": "No symptom lists provided"}), 400
+    if len(batch) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large, at most {MAX_BATCH_SIZE} symptom lists allowed"}), 400
+    if not all(is_symptom_list(symptoms) for symptoms in batch):
+        return jsonify({"error": "Each batch entry must be a list of symptom strings"}), 400
+    if not is_ready():
+        return jsonify({"error": "Models are still loading"}), 503
+
+    # Pin one model version for the whole request
+    bundle = registry.current
+
+    # Predict every non-empty entry together
+    with stage("resolve_symptoms"):
+        feature_sets = [bundle.vocabulary.indices(symptoms) for symptoms in batch if symptoms]
+    predictions = iter(predict_feature_sets(bundle, model_type, feature_sets))
+
+    # Results come back in input order, with errors in place of empty entries
+    results = [next(predictions) if symptoms else {"error": "No symptoms provided"} for symptoms in batch]
+
+    with stage("serialize"):
+        return jsonify({
+            "model_used": get_model_name(model_type),
+            "model_version": bundle.version,
+            "count": len(results),
+            "predictions": results
+        })
+
+# Prediction cache counters
+@predict_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if prediction_cache is None:
+        return jsonify({"error": "Models are still loading"}), 503
+    return jsonify(prediction_cache.stats())
+
+# Liveness: the process is up and serving HTTP
+@predict_bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+# Readiness: models are loaded and predictions can be served
+@predict_bp.route('/ready', methods=['GET'])
+def ready():
+    if not is_ready():
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True, "model_version": registry.version})
+
+def create_app(load_models=True, background_tasks=True):
+    """
+    Build the Flask app.
+
+    Args:
+        load_models (bool): Load models before returning; otherwise they load
+            on a background thread and /ready reports 503 until they are in
+        background_tasks (bool): Start watching for new model versions
+
+    Returns:
+        Flask: The configured app
+    """
+    app = Flask(__name__)
+    CORS(app)  # ✅ Enable CORS for all routes
+    app.register_blueprint(predict_bp)
+    instrument_app(app)  # Request/stage latency at GET /metrics
+
+    def load():
+        load_state()
+        if background_tasks:
+            start_background_tasks()
+
+    if load_models:
+        load()
+    else:
+        threading.Thread(target=load, daemon=True).start()
+    return app
+
+# Run Flask app (development server; see gunicorn.conf.py for production)
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=os.environ.get("FLASK_DEBUG", "0") == "1", threaded=True)
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from symptom_vocabulary import SymptomVocabulary, normalize_symptom
+
+# Common conditions that get boosted by the probability scorer
+COMMON_CONDITIONS = {
+    'Common Cold', 'Bronchial Asthma', 'Pneumonia', 'Migraine',
+    'Hypertension', 'Diabetes', 'Gastroenteritis', 'Acidity',
+    'Urinary tract infection', 'Allergy'
+}
+
+
+class SymptomMatcher:
+    """
+    Symptom-overlap scorer over the training matrix.
+
+    The 4,920 training rows only contain a few hundred distinct symptom
+    patterns, so the matrix is collapsed to unique (pattern, disease) pairs
+    once at load time. Every query then scores all patterns with a single
+    column gather and row sum instead of walking the DataFrame row by row.
+
+    For inputs given as training column names, rankings are identical to the
+    original per-row loops: scores are computed with the same float operations
+    in the same order, diseases keep their first-appearance order in the
+    training data and ties are broken by it. Other spellings are resolved
+    through the shared SymptomVocabulary first.
+    """
+
+    def __init__(self, training_df, target_column='prognosis', vocabulary=None):
+        symptom_columns = [col for col in training_df.columns if col != target_column]
+        if vocabulary is None:
+            vocabulary = SymptomVocabulary(symptom_columns)
+        elif vocabulary.features != symptom_columns:
+            raise ValueError("Vocabulary features do not match the training columns")
+        self.symptoms = symptom_columns
+        self.vocabulary = vocabulary
+
+        # Collapse duplicate rows, keeping first-appearance order
+        matrix = (training_df[symptom_columns].to_numpy() == 1)
+        diseases = training_df[target_column].to_numpy()
+        patterns = pd.DataFrame(matrix)
+        patterns['_disease'] = diseases
+        patterns = patterns.drop_duplicates()
+        matrix = patterns.drop(columns='_disease').to_numpy(dtype=np.uint8)
+        diseases = patterns['_disease'].to_numpy()
+
+        # Rows without any symptom never produce a score
+        totals = matrix.sum(axis=1)
+        keep = totals > 0
+        matrix, diseases, totals = matrix[keep], diseases[keep], totals[keep]
+
+        # Group patterns by disease so per-disease maxima are one reduceat
+        self.diseases = list(dict.fromkeys(diseases))
+        self._disease_rank = {disease: i for i, disease in enumerate(self.diseases)}
+        ranks = np.array([self._disease_rank[disease] for disease in diseases], dtype=np.intp)
+        order = np.argsort(ranks, kind='stable')
+        ranks = ranks[order]
+
+        # Column-major so gathering a few symptom columns is contiguous
+        self._matrix = np.asfortranarray(matrix[order])
+        self._totals = totals[order].astype(np.float64)
+        self._group_starts = np.flatnonzero(np.r_[True, ranks[1:] != ranks[:-1]])
+        self._common = np.array(
+            [disease in COMMON_CONDITIONS for disease in diseases[order]], dtype=bool
+        )
+
+    @classmethod
+    def from_csv(cls, path='Training.csv', target_column='prognosis'):
+        """Build a matcher straight from the training CSV."""
+        return cls(pd.read_csv(path), target_column=target_column)
+
+    @property
+    def pattern_count(self):
+        """Number of unique symptom patterns kept after deduplication."""
+        return self._matrix.shape[0]
+
+    def _overlap(self, patient_symptoms):
+        """Return per-pattern overlap counts and the number of distinct patient symptoms."""
+        indices, unknown = self.vocabulary.resolve_all(patient_symptoms)
+        symptom_count = len(indices) + len(unknown)
+        if not indices:
+            return np.zeros(self._matrix.shape[0], dtype=np.int64), symptom_count
+        return self._matrix[:, indices].sum(axis=1, dtype=np.int64), symptom_count
+
+    def _rank(self, scores, limit, pinned=None):
+        """Reduce pattern scores to per-disease maxima and return the top entries."""
+        disease_scores = np.maximum.reduceat(scores, self._group_starts)
+        names = self.diseases
+
+        # A pinned disease is inserted before the training diseases
+        if pinned:
+            pinned_name, pinned_score = pinned
+            if pinned_name in self._disease_rank:
+                i = self._disease_rank[pinned_name]
+                disease_scores[i] = max(pinned_score, disease_scores[i])
+                order = [i] + [j for j in range(len(names)) if j != i]
+                disease_scores = disease_scores[order]
+                names = [names[j] for j in order]
+            else:
+                disease_scores = np.r_[pinned_score, disease_scores]
+                names = [pinned_name] + names
+
+        top = np.argsort(-disease_scores, kind='stable')[:limit]
+        return [{'disease': names[i], 'probability': round(float(disease_scores[i]), 2)}
+                for i in top]
+
+    def disease_probabilities(self, patient_symptoms, limit=5):
+        """
+        Score diseases by symptom overlap, boosting common conditions.
+
+        Args:
+            patient_symptoms (list): Symptom column names, aliases or free-text variants
+            limit (int): Number of diseases to return
+
+        Returns:
+            list: Dictionaries with 'disease' and 'probability' keys, best first
+        """
+        overlap, symptom_count = self._overlap(patient_symptoms)
+
+        # Base score on symptom overlap
+        scores = (overlap / self._totals) * 100
+
+        # Boost common conditions
+        scores[self._common] *= 1.5
+
+        # Additional boost if all patient symptoms match
+        scores[overlap == symptom_count] *= 1.2
+
+        # Penalize severe conditions unless they have very high symptom match
+        scores[~self._common & (scores < 80)] *= 0.7
+
+        return self._rank(scores, limit)
+
+    def accurate_predictions(self, patient_symptoms, limit=5):
+        """
+        Score diseases by plain symptom coverage, without any boosts.
+
+        Args:
+            patient_symptoms (list): Symptom column names, aliases or free-text variants
+            limit (int): Number of diseases to return
+
+        Returns:
+            list: Dictionaries with 'disease' and 'probability' keys, best first
+        """
+        overlap, _ = self._overlap(patient_symptoms)
+        scores = (overlap / self._totals) * 100
+
+        # Check for chicken pox specifically
+        pinned = None
+        patient_keys = {normalize_symptom(s) for s in patient_symptoms}
+        if 'itchy_rash' in patient_keys and 'blisters' in patient_keys:
+            pinned = ('Chicken Pox', 100.0)
+
+        return self._rank(scores, limit, pinned=pinned)
@@ -0,0 +1,181 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Spelling fixes for the training columns and common free-text variants.
+# Each alias maps to one or more training columns.
+SYMPTOM_ALIASES = {
+    # Typos and stray characters in the training columns
+    'spotting urination': ['spotting_ urination'],
+    'foul smell of urine': ['foul_smell_of urine'],
+    'dischromic patches': ['dischromic _patches'],
+    'fluid overload': ['fluid_overload'],
+    'toxic look': ['toxic_look_(typhos)'],
+    'typhos': ['toxic_look_(typhos)'],
+    'cold hands and feet': ['cold_hands_and_feets'],
+    'swollen extremities': ['swollen_extremeties'],
+    'scarring': ['scurring'],
+    'blisters': ['blister'],
+
+    # Free-text variants
+    'itchy rash': ['itching', 'skin_rash'],
+    'itchy': ['itching'],
+    'itchiness': ['itching'],
+    'itchy skin': ['itching'],
+    'rash': ['skin_rash'],
+    'rashes': ['skin_rash'],
+    'sneezing': ['continuous_sneezing'],
+    'shivers': ['shivering'],
+    'chill': ['chills'],
+    'fever': ['high_fever'],
+    'temperature': ['high_fever'],
+    'low fever': ['mild_fever'],
+    'low grade fever': ['mild_fever'],
+    'tired': ['fatigue'],
+    'tiredness': ['fatigue'],
+    'exhaustion': ['fatigue'],
+    'vomit': ['vomiting'],
+    'throwing up': ['vomiting'],
+    'nauseous': ['nausea'],
+    'diarrhea': ['diarrhoea'],
+    'loose motions': ['diarrhoea'],
+    'stomach ache': ['stomach_pain'],
+    'stomachache': ['stomach_pain'],
+    'belly ache': ['belly_pain'],
+    'head ache': ['headache'],
+    'headaches': ['headache'],
+    'coughing': ['cough'],
+    'shortness of breath': ['breathlessness'],
+    'short of breath': ['breathlessness'],
+    'chest pains': ['chest_pain'],
+    'joint pains': ['joint_pain'],
+    'sweat': ['sweating'],
+    'sweats': ['sweating'],
+    'dizzy': ['dizziness'],
+    'anxious': ['anxiety'],
+    'depressed': ['depression'],
+    'yellow skin': ['yellowish_skin'],
+    'yellow eyes': ['yellowing_of_eyes'],
+    'heart racing': ['fast_heart_rate'],
+    'racing heart': ['fast_heart_rate'],
+}
+
+_SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+def normalize_symptom(symptom):
+    """
+    Reduce a raw symptom token to its lookup key.
+
+    Lowercases, strips surrounding brackets and quotes, and collapses runs of
+    spaces, underscores and hyphens into a single underscore, so that
+    'Skin Rash', 'skin-rash' and 'spotting_ urination' all hit one key.
+    """
+    symptom = symptom.strip("[]'\" ").lower()
+    return _SEPARATORS.sub('_', symptom).strip('_')
+
+
+class SymptomVocabulary:
+    """
+    Compiled mapping from raw symptom text to training feature indices.
+
+    Built once from the training columns; every input token is resolved with
+    a single dictionary lookup on its normalized key. Column names, their
+    normalized forms and the aliases above all resolve to the same indices.
+    """
+
+    def __init__(self, features, aliases=SYMPTOM_ALIASES):
+        self.features = list(features)
+        self.feature_index = {feature: i for i, feature in enumerate(self.features)}
+
+        lookup = {}
+        for i, feature in enumerate(self.features):
+            # First column wins when two columns normalize to the same key
+            lookup.setdefault(normalize_symptom(feature), (i,))
+        for alias, targets in aliases.items():
+            indices = tuple(self.feature_index[target] for target in targets if target in self.feature_index)
+            if indices:
+                lookup.setdefault(normalize_symptom(alias), indices)
+        self._lookup = lookup
+
+    @classmethod
+    def from_csv(cls, path='Training.csv', target_column='prognosis'):
+        """Build the vocabulary from the training CSV header only."""
+        columns = pd.read_csv(path, nrows=0).columns
+        return cls([col for col in columns if col != target_column])
+
+    def __len__(self):
+        return len(self.features)
+
+    def __contains__(self, symptom):
+        return normalize_symptom(symptom) in self._lookup
+
+    def parse(self, text):
+        """
+        Split comma-separated user input into cleaned symptom tokens.
+
+        Args:
+            text (str): Raw input such as "itching, skin rash" or "['itching']"
+
+        Returns:
+            list: Non-empty tokens with surrounding brackets and quotes removed
+        """
+        tokens = [token.strip("[]'\" ") for token in text.split(',')]
+        return [token for token in tokens if token]
+
+    def resolve(self, symptom):
+        """
+        Look up one symptom token.
+
+        Args:
+            symptom (str): Column name, alias or free-text variant
+
+        Returns:
+            tuple: Feature indices for the token, empty if it is unknown
+        """
+        return self._lookup.get(normalize_symptom(symptom), ())
+
+    def resolve_all(self, symptoms):
+        """
+        Resolve many tokens at once.
+
+        Args:
+            symptoms (list): Raw symptom tokens
+
+        Returns:
+            tuple: (sorted list of unique feature indices, list of unknown normalized tokens)
+        """
+        indices = set()
+        unknown = []
+        for symptom in symptoms:
+            key = normalize_symptom(symptom)
+            found = self._lookup.get(key)
+            if found:
+                indices.update(found)
+            elif key and key not in unknown:
+                unknown.append(key)
+        return sorted(indices), unknown
+
+    def indices(self, symptoms):
+        """Sorted unique feature indices for the known tokens in symptoms."""
+        return self.resolve_all(symptoms)[0]
+
+    def canonical(self, symptoms):
+        """Training column names for the known tokens in symptoms."""
+        return [self.features[i] for i in self.indices(symptoms)]
+
+    def vector(self, symptoms, dtype=np.float64):
+        """
+        Build a dense 1 x n_features input row for the models.
+
+        Args:
+            symptoms (list): Raw symptom tokens
+            dtype: NumPy dtype of the row
+
+        Returns:
+            numpy.ndarray: Binary feature row of shape (1, n_features)
+        """
+        row = np.zeros((1, len(self.features)), dtype=dtype)
+        row[0, self.indices(symptoms)] = 1
+        return row
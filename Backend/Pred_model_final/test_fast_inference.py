@@ -0,0 +1,73 @@
+"""
+Regression tests for the compiled inference engines.
+
+Run from this directory with `python -m pytest -q test_fast_inference.py`.
+A small model version is trained into a temporary directory once per run.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fast_inference import (RF_ENGINE_FILE, SVC_ENGINE_FILE, compile_forest, compile_svc,
+                            export_engines, load_engines, parity_inputs)
+from model_registry import ModelBundle
+from model_store import load_artifacts, read_metadata
+from train import train
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Training.csv')
+
+
+@pytest.fixture(scope='module')
+def model_dir(tmp_path_factory):
+    model_dir = str(tmp_path_factory.mktemp('models'))
+    train(DATA_PATH, model_dir=model_dir, n_estimators=10, version='test')
+    return model_dir
+
+
+@pytest.fixture(scope='module')
+def inputs(model_dir):
+    features = load_artifacts(model_dir).features
+    return pd.DataFrame(parity_inputs(features, DATA_PATH, random_rows=200), columns=features)
+
+
+def test_compiled_forest_matches_sklearn(model_dir, inputs):
+    rf_model = load_artifacts(model_dir).rf_model
+    np.testing.assert_allclose(compile_forest(rf_model).predict_proba(inputs),
+                               rf_model.predict_proba(inputs), rtol=0, atol=1e-9)
+
+
+def test_compiled_svc_matches_sklearn(model_dir, inputs):
+    svc_model = load_artifacts(model_dir).svc_model
+    expected = svc_model.predict_proba(inputs)
+    actual = compile_svc(svc_model).predict_proba(inputs)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-3)
+    assert np.mean(actual.argmax(axis=1) == expected.argmax(axis=1)) > 0.99
+
+
+def test_engines_load_only_after_a_recorded_parity_pass(model_dir):
+    artifacts = load_artifacts(model_dir)
+    assert load_engines(artifacts) == (None, None)
+    assert ModelBundle(artifacts, backend='compiled').models['rf'] is artifacts.rf_model
+
+    records = export_engines(artifacts, DATA_PATH)
+    assert all(record['parity_passed'] for record in records.values())
+    metadata = read_metadata('test', model_dir)
+    assert {RF_ENGINE_FILE, SVC_ENGINE_FILE} <= set(metadata['files'])
+
+    rf_engine, svc_engine = load_engines(load_artifacts(model_dir))
+    assert rf_engine is not None and svc_engine is not None
+
+
+def test_engines_with_a_failed_parity_check_are_refused(model_dir):
+    artifacts = load_artifacts(model_dir)
+    artifacts.metadata['compiled']['rf']['parity_passed'] = False
+    assert load_engines(artifacts)[0] is None
+
+    # A modified export no longer matches its recorded checksum
+    artifacts = load_artifacts(model_dir, verify=False)
+    with open(os.path.join(artifacts.path, SVC_ENGINE_FILE), 'ab') as file:
+        file.write(b'\0')
+    assert load_engines(artifacts)[1] is None
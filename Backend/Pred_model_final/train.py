@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Train the symptom classifiers and write a versioned artifact set.
+
+Each run writes models/<version>/ containing the Random Forest, the SVC, the
+label encoder and a metadata.json with the feature order, classes, training
+data checksum and the SHA-256 of every file. LATEST is only switched to the
+new version once everything is on disk, so running servers never see a
+half-written model.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import SVC
+
+from model_store import (MODEL_DIR, METADATA_FILE, RF_MODEL_FILE, SVC_MODEL_FILE,
+                         LABEL_ENCODER_FILE, file_sha256, mark_latest)
+
+
+def train(data_path='Training.csv', model_dir=MODEL_DIR, n_estimators=100, random_state=42, version=None):
+    """
+    Fit both models on the training CSV and publish them as a new version.
+
+    Args:
+        data_path (str): Path to Training.csv
+        model_dir (str): Root artifact directory
+        n_estimators (int): Number of trees in the Random Forest
+        random_state (int): Seed for the Random Forest
+        version (str, optional): Version name, defaults to a UTC timestamp
+
+    Returns:
+        dict: The metadata written for the new version
+    """
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    final_path = os.path.join(model_dir, version)
+    if os.path.exists(final_path):
+        raise FileExistsError(f"Model version {version} already exists in {model_dir}")
+
+    # Load the data
+    df = pd.read_csv(data_path)
+    X = df.drop('prognosis', axis=1)
+    y = df['prognosis']
+
+    # Label encode the target
+    le = LabelEncoder()
+    Y = le.fit_transform(y)
+
+    # Train the models
+    started = time.perf_counter()
+    rf_model = RandomForestClassifier(random_state=random_state, n_estimators=n_estimators)
+    rf_model.fit(X, Y)
+    rf_seconds = time.perf_counter() - started
+
+    # probability=True so /predict can rank SVC classes with predict_proba. It is
+    # deprecated from scikit-learn 1.9 (FutureWarning) and removed in 1.11, hence
+    # the pin in requirements.txt; compile_svc() also reads its Platt parameters
+    started = time.perf_counter()
+    svc_model = SVC(kernel='linear', probability=True, random_state=random_state)
+    svc_model.fit(X, Y)
+    svc_seconds = time.perf_counter() - started
+
+    # Write into a scratch directory and move it into place in one step
+    os.makedirs(model_dir, exist_ok=True)
+    tmp_path = os.path.join(model_dir, f'.{version}.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    joblib.dump(rf_model, os.path.join(tmp_path, RF_MODEL_FILE))
+    joblib.dump(svc_model, os.path.join(tmp_path, SVC_MODEL_FILE))
+    joblib.dump(le, os.path.join(tmp_path, LABEL_ENCODER_FILE))
+
+    metadata = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'training_data': {
+            'path': os.path.basename(data_path),
+            'sha256': file_sha256(data_path),
+            'rows': int(len(df)),
+            'unique_rows': int(len(df.drop_duplicates()))
+        },
+        'features': list(X.columns),
+        'classes': [str(c) for c in le.classes_],
+        'models': {
+            'rf': {
+                'file': RF_MODEL_FILE,
+                'params': {'n_estimators': n_estimators, 'random_state': random_state},
+                'train_accuracy': float(rf_model.score(X, Y)),
+                'fit_seconds': round(rf_seconds, 3)
+            },
+            'svc': {
+                'file': SVC_MODEL_FILE,
+                'params': {'kernel': 'linear', 'probability': True},
+                'train_accuracy': float(svc_model.score(X, Y)),
+                'fit_seconds': round(svc_seconds, 3)
+            }
+        },
+        'label_encoder': {'file': LABEL_ENCODER_FILE},
+        'library_versions': {
+            'scikit-learn': sklearn.__version__,
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'files': {
+            name: file_sha256(os.path.join(tmp_path, name))
+            for name in (RF_MODEL_FILE, SVC_MODEL_FILE, LABEL_ENCODER_FILE)
+        }
+    }
+    with open(os.path.join(tmp_path, METADATA_FILE), 'w') as file:
+        json.dump(metadata, file, indent=2)
+
+    os.replace(tmp_path, final_path)
+    mark_latest(version, model_dir)
+    return metadata
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Train the symptom classifiers")
+    parser.add_argument("--data", default="Training.csv", help="Training CSV path")
+    parser.add_argument("--output", default=MODEL_DIR, help="Artifact root directory")
+    parser.add_argument("--version", help="Version name (default: UTC timestamp)")
+    parser.add_argument("--n-estimators", type=int, default=100, help="Random Forest size")
+    parser.add_argument("--random-state", type=int, default=42, help="Random seed")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    metadata = train(
+        data_path=args.data,
+        model_dir=args.output,
+        n_estimators=args.n_estimators,
+        random_state=args.random_state,
+        version=args.version
+    )
+    print(f"Trained model version {metadata['version']} -> {os.path.join(args.output, metadata['version'])}")
+    for name, info in metadata['models'].items():
+        print(f"  {name}: train accuracy {info['train_accuracy']:.4f} ({info['fit_seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
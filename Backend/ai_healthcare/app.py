@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify, url_for, send_from_directory
+from flask import Flask, Request, Response, request, jsonify, url_for, send_from_directory
 from flask_cors import CORS
+import json
 import os
-from werkzeug.utils import secure_filename
+import threading
+import zipfile
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
+from model_session import ModelSession, INPUT_SHAPE, MODEL_VARIANTS, decode_image, format_prediction
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from upload_store import UploadStore, content_hash
+from study_jobs import StudyJobManager, StudyQueueFull, ZipStudy
+from healthcare_common.metrics import REGISTRY, instrument_app, stage
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+instrument_app(app)  # Request/stage latency at GET /metrics
 
 # Configure upload folder
 UPLOAD_FOLDER = 'static/uploads'
@@ -16,76 +23,316 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Keeping a copy of each upload for the preview URL is optional (SAVE_UPLOADS=0
+# disables it) and happens on a background thread after the prediction
+SAVE_UPLOADS = os.environ.get('SAVE_UPLOADS', '1') == '1'
+
+# Stored files are named by content hash and never change, so browsers may
+# cache them for a year
+PREVIEW_MAX_AGE = 365 * 24 * 3600
+
+# Uploads are stored under their content hash as small previews (creates the
+# folder if needed). The folder is kept under MRI_UPLOAD_MAX_MB, and files not
+# viewed for MRI_UPLOAD_MAX_AGE seconds are removed; 0 disables a limit.
+upload_store = UploadStore(
+    UPLOAD_FOLDER,
+    max_bytes=int(os.environ.get('MRI_UPLOAD_MAX_MB', 1024)) * 1024 * 1024,
+    max_age=int(os.environ.get('MRI_UPLOAD_MAX_AGE', 7 * 24 * 3600)),
+    preview_size=int(os.environ.get('MRI_PREVIEW_SIZE', 256)),
+    keep_originals=os.environ.get('MRI_KEEP_ORIGINALS', '0') == '1'
+)
+
+# Results of already-seen scans, by content hash, for the serving model version
+prediction_cache = PredictionCache(maxsize=int(os.environ.get('MRI_PREDICTION_CACHE_SIZE', 4096)))
+
+# Load the model once per process, warmed up, without blocking startup
+# MODEL_PRECISION picks float32 (Keras) or a float16/int8 TFLite variant made
+# by quantize.py; MODEL_PATH overrides the file directly
+MODEL_PRECISION = os.environ.get('MODEL_PRECISION', 'float32')
+if MODEL_PRECISION not in MODEL_VARIANTS:
+    raise ValueError(f"MODEL_PRECISION must be one of {sorted(MODEL_VARIANTS)}, got {MODEL_PRECISION!r}")
+model_session = ModelSession(os.environ.get('MODEL_PATH', MODEL_VARIANTS[MODEL_PRECISION]))
+model_session.load_async()
+
+# Concurrent uploads are grouped into one model call: a batch is flushed when
+# it holds MRI_MAX_BATCH_SIZE images or MRI_MAX_BATCH_WAIT_MS after its first.
+# A request gives up after MRI_PREDICT_TIMEOUT seconds.
+batcher = MicroBatcher(
+    model_session.predict,
+    max_batch_size=int(os.environ.get('MRI_MAX_BATCH_SIZE', 8)),
+    max_wait_ms=float(os.environ.get('MRI_MAX_BATCH_WAIT_MS', 5)),
+    timeout=float(os.environ.get('MRI_PREDICT_TIMEOUT', 30))
+)
+
+# Multi-slice studies are processed as background jobs on a decode pool that
+# feeds the same micro-batcher; they get their own, larger upload limit. At
+# most MRI_STUDY_MAX_ACTIVE studies are in progress, further ones get a 429.
+STUDY_MAX_CONTENT_LENGTH = int(os.environ.get('MRI_STUDY_MAX_MB', 512)) * 1024 * 1024
+STUDY_MAX_SLICES = int(os.environ.get('MRI_STUDY_MAX_SLICES', 1000))
+STUDY_RETRY_AFTER = 10
+study_jobs = StudyJobManager(
+    batcher,
+    prediction_cache=prediction_cache,
+    version_fn=lambda: model_session.version,
+    workers=int(os.environ.get('MRI_STUDY_WORKERS', batcher.max_batch_size)),
+    ttl=int(os.environ.get('MRI_STUDY_TTL', 3600)),
+    max_active=int(os.environ.get('MRI_STUDY_MAX_ACTIVE', 4))
+)
+
+class UploadRequest(Request):
+    """Request whose upload limit is the study limit on /api/studies and MAX_CONTENT_LENGTH elsewhere"""
+    @property
+    def max_content_length(self):
+        # Flask before 3.1 has no per-request setter, so the limit is picked here
+        if self.endpoint == 'create_study':
+            return STUDY_MAX_CONTENT_LENGTH
+        return super().max_content_length
+
+app.request_class = UploadRequest
+
+# Component counters, read only when /metrics is scraped
+REGISTRY.register_stats('mri_model', model_session.status, gauges=('load_seconds',))
+REGISTRY.register_stats('mri_prediction_cache', prediction_cache.stats,
+                        counters=('hits', 'misses', 'evictions'), gauges=('size', 'maxsize', 'hit_ratio'))
+REGISTRY.register_stats('mri_batcher', batcher.stats,
+                        counters=('batches', 'images', 'flushed_full', 'flushed_on_timeout'),
+                        gauges=('mean_batch_size', 'mean_fill_ratio', 'queued'))
+REGISTRY.register_stats('mri_uploads', upload_store.stats,
+                        counters=('evictions',), gauges=('files', 'bytes', 'pending_writes'))
+REGISTRY.register_stats('mri_studies', study_jobs.stats, counters=('rejected',),
+                        gauges=('jobs', 'running', 'pending_slices'))
+
+def model_unavailable():
+    """Error response while the model cannot serve requests, None once it is ready."""
+    if model_session.ready:
+        return None
+    if model_session.failed:
+        return jsonify({'error': f'Model failed to load: {model_session.error}'}), 503
+    return jsonify({'error': 'Model is still loading, try again shortly'}), 503
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def predict_tumor(image_path):
-    # Load the model
-    model = load_model('brain_tumor_mri.keras')
-    
-    # Load and preprocess the image
-    img = load_img(image_path, target_size=(256, 256), color_mode='grayscale')
-    img_array = img_to_array(img)
-    
-    # Normalize and prepare input
-    img_normalized = img_array / 255.0
-    img_normalized = np.expand_dims(img_normalized, axis=0)
-    
-    # Make prediction
-    predictions = model.predict(img_normalized)
-    classes = ['Glioma', 'Meningioma', 'Pituitary', 'No Tumor']
-    
-    # Get prediction results
-    predicted_class = classes[np.argmax(predictions[0])]
-    confidence_scores = {
-        class_name: float(prob) * 100 
-        for class_name, prob in zip(classes, predictions[0])
-    }
+# One uint8 decode buffer per request thread. Reusing it is safe because
+# batcher.predict blocks until the batch holding it has been copied and run
+# (a request that times out drops its buffer).
+_buffers = threading.local()
+
+def input_buffer():
+    buffer = getattr(_buffers, 'image', None)
+    if buffer is None:
+        buffer = _buffers.image = np.empty(INPUT_SHAPE, dtype=np.uint8)
+    return buffer
+
+def predict_tumor(data):
+    # Decode the upload bytes straight into the model's uint8 input;
+    # scaling to [0, 1] happens inside the model graph
+    with stage('decode'):
+        img_array = decode_image(data, out=input_buffer())
     
-    return predicted_class, confidence_scores
+    # Make prediction with the shared model, batched with concurrent requests
+    with stage('inference'):
+        try:
+            probabilities = batcher.predict(img_array)
+        except TimeoutError:
+            # The batcher may still read this buffer, so the next request gets a new one
+            _buffers.image = None
+            raise
+    return format_prediction(probabilities)
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
-    if 'file' not in request.files:
+    with stage('parse_upload'):
+        has_file = 'file' in request.files
+    if not has_file:
         return jsonify({'error': 'No file uploaded'}), 400
     
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
+    
     if file and allowed_file(file.filename):
-        # Save the file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        extension = file.filename.rsplit('.', 1)[1].lower()
         
         try:
-            # Make prediction
-            predicted_class, confidence_scores = predict_tumor(filepath)
+            # Read the upload once; identical scans are answered from the cache
+            with stage('read_upload'):
+                data = file.read()
+            with stage('cache_lookup'):
+                digest = content_hash(data)
+                version = model_session.version
+                prediction_cache.bind(version)
+                cached = prediction_cache.get(digest)
+            if cached is not None:
+                predicted_class, confidence_scores = cached
+            else:
+                predicted_class, confidence_scores = predict_tumor(data)
+                prediction_cache.put(digest, (predicted_class, confidence_scores), version=version)
             
-            # Get the host from the request
-            host = request.host_url.rstrip('/')
-            image_url = f"{host}/static/uploads/{filename}"
+            # Save a downscaled preview off the request path
+            image_url = None
+            if SAVE_UPLOADS:
+                with stage('queue_save'):
+                    filename = upload_store.save_async(data, digest, extension)
+                host = request.host_url.rstrip('/')
+                image_url = f"{host}/static/uploads/{filename}"
             
-            return jsonify({
-                'success': True,
-                'prediction': predicted_class,
-                'confidence_scores': confidence_scores,
-                'image_url': image_url
-            })
+            with stage('serialize'):
+                return jsonify({
+                    'success': True,
+                    'prediction': predicted_class,
+                    'confidence_scores': confidence_scores,
+                    'image_url': image_url,
+                    'image_id': digest,
+                    'model_version': version,
+                    'cached': cached is not None
+                })
         
+        except TimeoutError as e:
+            return jsonify({'error': f'{e}, try again shortly'}), 503
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+def studies_busy(message):
+    """429 with a retry hint while too many studies are in progress"""
+    return jsonify({'error': message, 'retry_after': STUDY_RETRY_AFTER}), 429, \
+        {'Retry-After': str(STUDY_RETRY_AFTER)}
+
+def close_archives(archives):
+    for archive in archives:
+        archive.close()
+
+# Start a multi-slice study job: a zip of slices or several 'files' parts
+@app.route('/api/studies', methods=['POST'])
+def create_study():
+    # Refuse before the upload is read when the job queue is already full
+    if study_jobs.full():
+        return studies_busy('Too many studies are being processed, try again shortly')
+    
+    files = request.files.getlist('files') + request.files.getlist('file')
+    files = [file for file in files if file.filename]
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
+    
+    # Zips are only checked here; their slices are decompressed by the job
+    archives = []
+    slices = []
+    try:
+        for file in files:
+            if file.filename.lower().endswith('.zip'):
+                archive = ZipStudy(file.stream, ALLOWED_EXTENSIONS, STUDY_MAX_SLICES, STUDY_MAX_CONTENT_LENGTH)
+                archives.append(archive)
+                slices.extend(archive.slices())
+            elif allowed_file(file.filename):
+                slices.append((file.filename, file.read()))
+            else:
+                raise ValueError(f'Invalid file type: {file.filename}')
+        
+        if not slices:
+            raise ValueError('No image slices found')
+        if len(slices) > STUDY_MAX_SLICES:
+            raise ValueError(f'Study has {len(slices)} slices, the limit is {STUDY_MAX_SLICES}')
+        
+        job = study_jobs.submit(slices, on_done=lambda: close_archives(archives))
+    except (ValueError, zipfile.BadZipFile) as e:
+        close_archives(archives)
+        return jsonify({'error': str(e)}), 400
+    except StudyQueueFull as e:
+        close_archives(archives)
+        return studies_busy(f'{e}, try again shortly')
+    
+    host = request.host_url.rstrip('/')
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'total_slices': job.total,
+        'status_url': f"{host}/api/studies/{job.id}",
+        'stream_url': f"{host}/api/studies/{job.id}/stream"
+    }), 202
+
+# Poll a study job: per-slice results so far, study result once done
+@app.route('/api/studies/<job_id>')
+def study_status(job_id):
+    job = study_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown study job'}), 404
+    return jsonify(job.snapshot())
+
+# Server-sent events: one 'slice' event per finished slice, then a 'study' event
+@app.route('/api/studies/<job_id>/stream')
+def study_stream(job_id):
+    job = study_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown study job'}), 404
+    
+    def generate():
+        position = 0
+        while True:
+            events = job.wait_for_events(position, timeout=15)
+            if not events:
+                if job.done:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for name, data in events:
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+            position += len(events)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Liveness: fails once the model load has failed, since the process cannot recover
+@app.route('/health')
+def health():
+    if model_session.failed:
+        return jsonify({'status': 'error', 'error': f'Model failed to load: {model_session.error}'}), 503
+    return jsonify({'status': 'ok'})
+
+# Readiness: only true once the model is loaded and warmed up
+@app.route('/api/ready')
+def ready():
+    status = model_session.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+# Batch-fill statistics of the micro-batcher
+@app.route('/api/batching/stats')
+def batching_stats():
+    return jsonify(batcher.stats())
+
+# Prediction cache counters
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+# Upload storage usage
+@app.route('/api/uploads/stats')
+def upload_stats():
+    return jsonify(upload_store.stats())
+
 # Route to serve static files
 @app.route('/static/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # A preview requested right after /api/predict may still be being written
+    upload_store.wait_for(filename)
+    upload_store.touch(filename)
+    
+    # The content hash in the name is a strong ETag, so revalidations get a 304
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=PREVIEW_MAX_AGE, etag=filename.split('.', 1)[0])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001) 
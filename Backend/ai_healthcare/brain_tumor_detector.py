@@ -1,36 +1,263 @@
+#!/usr/bin/env python3
+"""
+Bulk brain-tumor inference over a directory, glob or list of MRI scans.
+
+Images are decoded and resized by a pool of worker threads into per-batch
+uint8 buffers while the model runs on earlier batches, so the model never
+waits on disk or decoding as long as the pool keeps up. Results are
+streamed to CSV or JSONL (one row per image, flushed after every batch)
+with the predicted class and every class confidence in percent.
+
+With --resume an existing output file is read first, a partially written
+last line is dropped, images already in it are skipped, and new rows are
+appended.
+
+Examples:
+    python brain_tumor_detector.py scans/ -o results.csv
+    python brain_tumor_detector.py "archive/**/*.png" -o results.jsonl --resume
+    python brain_tumor_detector.py --file-list todo.txt -o - --format jsonl
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
 
-# Load the model
-model = load_model('brain_tumor_mri.keras')
+from model_session import CLASSES, INPUT_SHAPE, ModelSession, decode_image, format_prediction
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+FIELDS = ['path', 'prediction', *CLASSES, 'error']
+
+
+def expand_inputs(inputs, file_list=None):
+    """
+    Resolve directories, glob patterns and file paths into a sorted list of images.
+
+    Directories are searched recursively for IMAGE_EXTENSIONS files.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths.extend(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        else:
+            paths.append(item)
+
+    if file_list:
+        with open(file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    # De-duplicate while keeping a stable order across runs
+    return sorted(set(paths))
+
+
+def read_completed(output, fmt):
+    """
+    Collect the paths already written to a partial output file.
+
+    A last line cut off by an interrupted run is removed from the file so
+    that appending starts on a clean line.
+
+    Returns:
+        set: Paths present in the file
+    """
+    if output == '-' or not os.path.exists(output):
+        return set()
+
+    with open(output, 'rb+') as f:
+        content = f.read()
+        end = content.rfind(b'\n') + 1
+        if end < len(content):
+            f.truncate(end)
+    lines = content[:end].decode('utf-8').splitlines()
+
+    if fmt == 'csv':
+        rows = csv.DictReader(lines)
+        return {row['path'] for row in rows if row.get('path')}
+    return {json.loads(line)['path'] for line in lines if line.strip()}
+
+
+class ResultWriter:
+    """Streams one result row per image as CSV or JSONL."""
+
+    def __init__(self, output, fmt, append=False):
+        self.fmt = fmt
+        if output == '-':
+            self.file = sys.stdout
+            needs_header = True
+        else:
+            needs_header = not (append and os.path.exists(output) and os.path.getsize(output) > 0)
+            self.file = open(output, 'a' if append else 'w', newline='')
+
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if needs_header:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def decode_into(path, out):
+    """Decode one image file into out; returns an error message instead of raising."""
+    try:
+        with open(path, 'rb') as f:
+            decode_image(f.read(), out=out)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def decoded_batches(paths, pool, batch_size, prefetch):
+    """
+    Yield (paths, images, errors) batches, decoding up to prefetch batches ahead.
+
+    Each batch is decoded into its own uint8 buffer, so batches in flight
+    never share memory.
+    """
+    pending = deque()
+    chunks = (paths[i:i + batch_size] for i in range(0, len(paths), batch_size))
+
+    def submit(chunk):
+        images = np.empty((len(chunk), *INPUT_SHAPE), dtype=np.uint8)
+        futures = [pool.submit(decode_into, path, images[i]) for i, path in enumerate(chunk)]
+        pending.append((chunk, images, futures))
+
+    for chunk in chunks:
+        submit(chunk)
+        if len(pending) > prefetch:
+            chunk, images, futures = pending.popleft()
+            yield chunk, images, [future.result() for future in futures]
+
+    while pending:
+        chunk, images, futures = pending.popleft()
+        yield chunk, images, [future.result() for future in futures]
+
+
+def result_row(path, probabilities=None, error=None):
+    row = dict.fromkeys(FIELDS)
+    row['path'] = path
+    row['error'] = error
+    if probabilities is not None:
+        predicted_class, confidence_scores = format_prediction(probabilities)
+        row['prediction'] = predicted_class
+        row.update({name: round(score, 4) for name, score in confidence_scores.items()})
+    return row
+
+
+def run(paths, session, writer, batch_size=32, workers=None, prefetch=2, progress=True):
+    """
+    Score every path and write one row per image.
+
+    Returns:
+        tuple: (images scored, images that failed to decode)
+    """
+    scored = failed = 0
+    started = last_report = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as pool:
+        for chunk, images, errors in decoded_batches(paths, pool, batch_size, prefetch):
+            ok = [i for i, error in enumerate(errors) if error is None]
+            if len(ok) < len(chunk):
+                images = images[ok]
+            probabilities = iter(session.predict(images) if ok else [])
+
+            for path, error in zip(chunk, errors):
+                if error is None:
+                    writer.write(result_row(path, next(probabilities)))
+                    scored += 1
+                else:
+                    writer.write(result_row(path, error=error))
+                    failed += 1
+            writer.flush()
+
+            now = time.perf_counter()
+            if progress and now - last_report >= 5:
+                done = scored + failed
+                print(f"{done}/{len(paths)} images, {done / (now - started):.1f} images/s",
+                      file=sys.stderr)
+                last_report = now
+
+    return scored, failed
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Brain tumor classification for many MRI scans")
+    parser.add_argument("inputs", nargs="*", help="Image files, directories or glob patterns")
+    parser.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument("-o", "--output", default="-", help="Output file, '-' for stdout (default)")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Output format (default: from the output extension, else jsonl)")
+    parser.add_argument("--resume", action="store_true", help="Skip images already in the output file and append")
+    parser.add_argument("--model", default=os.environ.get('MODEL_PATH', 'brain_tumor_mri.keras'),
+                        help="Path to the Keras model")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per model call")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decode worker threads")
+    parser.add_argument("--prefetch", type=int, default=2, help="Batches decoded ahead of the model")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    if not args.inputs and not args.file_list:
+        print("Error: give at least one image, directory, glob or --file-list", file=sys.stderr)
+        return 2
 
-# Your image path
-image_path = 'D:/06_projects/Impetus/image.png'
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    paths = expand_inputs(args.inputs, args.file_list)
 
-# Load and preprocess the image
-img = load_img(image_path, target_size=(256, 256), color_mode='grayscale')  
-img_array = img_to_array(img)
+    if args.resume:
+        if args.output == '-':
+            print("Error: --resume needs an output file", file=sys.stderr)
+            return 2
+        completed = read_completed(args.output, fmt)
+        paths = [path for path in paths if path not in completed]
+        if not args.quiet:
+            print(f"Resuming: {len(completed)} images already scored", file=sys.stderr)
 
-# Simple normalization
-img_normalized = img_array / 255.0
-img_normalized = np.expand_dims(img_normalized, axis=0)
+    if not paths:
+        if not args.quiet:
+            print("Nothing to score", file=sys.stderr)
+        return 0
 
-# Make predictions
-predictions = model.predict(img_normalized)
+    session = ModelSession(args.model).load()
+    writer = ResultWriter(args.output, fmt, append=args.resume)
+    started = time.perf_counter()
+    try:
+        scored, failed = run(paths, session, writer, batch_size=args.batch_size,
+                             workers=args.workers, prefetch=args.prefetch, progress=not args.quiet)
+    finally:
+        writer.close()
 
-# Define classes
-classes = ['Glioma', 'Meningioma', 'Pituitary', 'No Tumor']
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        print(f"Scored {scored} images ({failed} failed) in {elapsed:.1f}s, "
+              f"{(scored + failed) / elapsed:.1f} images/s", file=sys.stderr)
+    return 1 if failed else 0
 
-# Print results
-print("\nPrediction Results:")
-print("Raw predictions:", predictions[0])
-predicted_class = np.argmax(predictions, axis=1)
-print(f"\nPredicted Class: {classes[predicted_class[0]]}")
-print("\nConfidence Scores:")
-for class_name, prob in zip(classes, predictions[0]):
-    print(f"{class_name}: {prob*100:.2f}%")
 
-# Print model summary to verify input shape
-print("\nModel Architecture:")
-model.summary()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-image requests into one model call.
+
+    Request threads submit() one preprocessed image and wait on the returned
+    Future. A single worker thread takes the first queued image, keeps
+    collecting until either max_batch_size images are queued or max_wait_ms
+    has passed since that first image arrived, runs predict_fn once on the
+    stacked batch and hands each row back to its caller. A batch that fails,
+    in the model or already while stacking its images, fails the futures of
+    its images and the worker moves on to the next one.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=5.0, timeout=30.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._full_flushes = 0
+        self._timeout_flushes = 0
+        self._size_counts = [0] * (max_batch_size + 1)
+        self._worker = threading.Thread(target=self._run, name='mri-micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, image):
+        """
+        Queue one image for the next batch.
+
+        Args:
+            image (numpy.ndarray): One preprocessed model input without the batch axis
+
+        Returns:
+            Future: Resolves to that image's row of the model output
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def predict(self, image, timeout=None):
+        """
+        Submit one image and block until its result is ready.
+
+        Args:
+            image (numpy.ndarray): One preprocessed model input without the batch axis
+            timeout (float, optional): Seconds to wait, defaults to the batcher's timeout
+
+        Raises:
+            TimeoutError: No result within the timeout; the image is dropped
+                if it has not been batched yet
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(image)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"No prediction within {timeout}s") from None
+
+    def _collect(self):
+        batch = []
+        while not batch:
+            item = self._queue.get()
+            if item is _STOP:
+                return None, False
+            # Skips images whose caller gave up waiting
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch, len(batch) == self.max_batch_size
+
+    def _run(self):
+        while True:
+            batch, full = self._collect()
+            if batch is None:
+                return
+
+            try:
+                images = np.stack([image for image, _ in batch])
+                outputs = self.predict_fn(images)
+            except Exception as e:
+                logger.error(f"Batched prediction failed for {len(batch)} images: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+            self._record(len(batch), full)
+
+    def _record(self, size, full):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._size_counts[size] += 1
+            if full:
+                self._full_flushes += 1
+            else:
+                self._timeout_flushes += 1
+
+    def stats(self):
+        """Batch-fill statistics since startup."""
+        with self._stats_lock:
+            mean_size = self._items / self._batches if self._batches else 0.0
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self._batches,
+                'images': self._items,
+                'mean_batch_size': round(mean_size, 3),
+                'mean_fill_ratio': round(mean_size / self.max_batch_size, 3),
+                'flushed_full': self._full_flushes,
+                'flushed_on_timeout': self._timeout_flushes,
+                'batch_size_histogram': {
+                    str(size): count for size, count in enumerate(self._size_counts) if count
+                },
+                'queued': self._queue.qsize()
+            }
+
+    def close(self):
+        """Stop the worker after the queued images are processed."""
+        self._queue.put(_STOP)
+        self._worker.join()
@@ -0,0 +1,233 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from tensorflow.keras.models import load_model
+
+try:
+    # Standalone LiteRT runtime, if installed
+    from ai_edge_litert.interpreter import Interpreter as TFLiteInterpreter
+except ImportError:
+    TFLiteInterpreter = tf.lite.Interpreter
+
+logger = logging.getLogger(__name__)
+
+# Output classes of brain_tumor_mri.keras, in model output order
+CLASSES = ['Glioma', 'Meningioma', 'Pituitary', 'No Tumor']
+
+# Model input: one 256x256 grayscale channel
+IMAGE_SIZE = (256, 256)
+INPUT_SHAPE = (*IMAGE_SIZE, 1)
+
+# Model files for each MODEL_PRECISION; the reduced-precision variants are
+# produced from the float32 model by quantize.py
+MODEL_VARIANTS = {
+    'float32': 'brain_tumor_mri.keras',
+    'float16': 'brain_tumor_mri_float16.tflite',
+    'int8': 'brain_tumor_mri_int8.tflite'
+}
+
+
+class TFLitePredictor:
+    """
+    Runs a converted .tflite model on uint8 image batches.
+
+    Images are fed one at a time so the interpreter keeps its batch-1 tensor
+    allocation; resizing the input for every batch size the micro-batcher
+    produces costs more than it saves on CPU. The interpreter is not
+    thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.interpreter = TFLiteInterpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]['index']
+        output = self.interpreter.get_output_details()[0]
+        self._output = output['index']
+        self._classes = output['shape'][-1]
+        self._lock = threading.Lock()
+
+    def __call__(self, images):
+        probabilities = np.empty((len(images), self._classes), dtype=np.float32)
+        with self._lock:
+            for i, image in enumerate(images):
+                self.interpreter.set_tensor(self._input, image[np.newaxis].astype(np.float32) / 255.0)
+                self.interpreter.invoke()
+                probabilities[i] = self.interpreter.get_tensor(self._output)[0]
+        return probabilities
+
+
+class ModelSession:
+    """
+    Owns the brain-tumor model for the lifetime of the process.
+
+    The Keras file is deserialized once, a traced tf.function is built for a
+    fixed input signature, and a warm-up inference on a dummy tensor triggers
+    graph tracing before the session reports ready. The traced function holds
+    no per-call Python state, so it can be called from any request thread.
+
+    Inputs are raw uint8 pixels; scaling to [0, 1] is part of the traced
+    graph, so callers never materialize a float copy of the image.
+
+    A .tflite model_path (see MODEL_VARIANTS) is run with the TFLite
+    interpreter instead of Keras.
+    """
+
+    def __init__(self, model_path='brain_tumor_mri.keras'):
+        self.model_path = model_path
+        self.model = None
+        self.backend = 'tflite' if model_path.endswith('.tflite') else 'keras'
+        self.version = None
+        self.error = None
+        self.load_error = None  # the exception of the last failed load
+        self.load_seconds = None
+        self._predict_fn = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def failed(self):
+        """True once a load has failed and no model is serving; it will not recover on its own."""
+        return self.load_error is not None and not self.ready
+
+    def load(self):
+        """Load the model and warm it up; safe to call more than once."""
+        with self._lock:
+            if self.ready:
+                return self
+            started = time.perf_counter()
+            try:
+                if self.backend == 'tflite':
+                    model = None
+                    predict_fn = TFLitePredictor(self.model_path)
+                else:
+                    model = load_model(self.model_path, compile=False)
+                    traced = tf.function(
+                        lambda images: model(tf.cast(images, tf.float32) / 255.0, training=False),
+                        input_signature=[tf.TensorSpec(shape=(None, *INPUT_SHAPE), dtype=tf.uint8)]
+                    )
+                    predict_fn = lambda images: traced(tf.convert_to_tensor(images, dtype=tf.uint8)).numpy()
+
+                # Trace the graph (or allocate the interpreter) now instead of on the first upload
+                predict_fn(np.zeros((1, *INPUT_SHAPE), dtype=np.uint8))
+            except Exception as e:
+                self.error = str(e)
+                self.load_error = e
+                logger.error(f"Failed to load model {self.model_path}: {e}")
+                raise
+
+            self.model = model
+            self.version = model_version(self.model_path)
+            self._predict_fn = predict_fn
+            self.error = None
+            self.load_error = None
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self._ready.set()
+            logger.info(f"Loaded {self.model_path} in {self.load_seconds}s")
+            return self
+
+    def load_async(self):
+        """Load on a background thread so the web server can start immediately."""
+        def run():
+            try:
+                self.load()
+            except Exception:
+                pass  # Recorded in self.load_error and reported by the API
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_until_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def predict(self, images):
+        """
+        Run the model on a batch of preprocessed images.
+
+        Args:
+            images (numpy.ndarray): uint8 array of shape (n, 256, 256, 1) with raw pixel values
+
+        Returns:
+            numpy.ndarray: Class probabilities of shape (n, len(CLASSES))
+        """
+        if not self.ready:
+            raise RuntimeError("Model is not loaded")
+        return self._predict_fn(images)
+
+    def status(self):
+        """Readiness details for the health endpoint."""
+        return {
+            'ready': self.ready,
+            'failed': self.failed,
+            'model_path': self.model_path,
+            'model_version': self.version,
+            'backend': self.backend,
+            'load_seconds': self.load_seconds,
+            'error': self.error
+        }
+
+
+def model_version(path):
+    """Short content fingerprint of a model file, used to tag cached results."""
+    if os.path.isdir(path):
+        # SavedModel directory: fall back to its modification time
+        return f"mtime-{int(os.path.getmtime(path))}"
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def decode_image(data, out=None):
+    """
+    Decode an encoded image (PNG/JPEG bytes) into one model input.
+
+    Matches keras load_img(target_size=IMAGE_SIZE, color_mode='grayscale'):
+    grayscale conversion first, then a nearest-neighbour resize, each done
+    once and only when needed.
+
+    Args:
+        data (bytes): Encoded image file contents
+        out (numpy.ndarray, optional): uint8 buffer of shape INPUT_SHAPE to decode into
+
+    Returns:
+        numpy.ndarray: uint8 array of shape INPUT_SHAPE
+    """
+    if out is None:
+        out = np.empty(INPUT_SHAPE, dtype=np.uint8)
+
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode != 'L':
+            img = img.convert('L')
+        width_height = (IMAGE_SIZE[1], IMAGE_SIZE[0])
+        if img.size != width_height:
+            img = img.resize(width_height, Image.NEAREST)
+        out[..., 0] = img
+    return out
+
+
+def format_prediction(probabilities):
+    """
+    Turn one row of class probabilities into the API result.
+
+    Returns:
+        tuple: (predicted class name, {class name: confidence in percent})
+    """
+    predicted_class = CLASSES[int(np.argmax(probabilities))]
+    confidence_scores = {
+        class_name: float(prob) * 100
+        for class_name, prob in zip(CLASSES, probabilities)
+    }
+    return predicted_class, confidence_scores
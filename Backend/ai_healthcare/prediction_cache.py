@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache from upload content hash to prediction result.
+
+    The cache is bound to a model version and empties itself as soon as a
+    different version is bound, so a result is only ever served for the
+    model that produced it. Cached values are shared between requests and
+    must not be modified.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, version):
+        """
+        Attach the cache to a model version, clearing it if the version changed.
+
+        Returns:
+            bool: True if existing entries were invalidated
+        """
+        with self._lock:
+            if version == self.version:
+                return False
+            changed = self.version is not None
+            self.version = version
+            self._entries.clear()
+            return changed
+
+    def get(self, digest):
+        """Return the cached result for a content hash, or None on a miss."""
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            value = self._entries.get(digest)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return value
+
+    def put(self, digest, value, version):
+        """
+        Store a result, evicting the least recently used entries when full.
+
+        Results from any other version than the bound one are dropped.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[digest] = value
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for the /api/cache/stats endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
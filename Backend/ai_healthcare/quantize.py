@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Convert brain_tumor_mri.keras into reduced-precision TFLite variants.
+
+Produces the files named in model_session.MODEL_VARIANTS:
+
+- float16: weights stored as float16, computation in float32
+- int8: weights and activations quantized to int8, calibrated on a
+  representative set of real scans (float32 input and output are kept, so
+  the variant is a drop-in replacement)
+
+Every variant, and the float32 model itself, is then run on an evaluation
+set and compared against the float32 predictions: top-1 agreement,
+confidence differences, latency, file size and, when the evaluation images
+sit in per-class directories (glioma/, meningioma/, pituitary/, notumor/),
+accuracy. The comparison is written as a JSON parity report.
+
+Serve a variant with MODEL_PRECISION=float16 or MODEL_PRECISION=int8.
+
+Example:
+    python quantize.py --calibration dataset/Training --eval dataset/Testing
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import tensorflow as tf
+
+from brain_tumor_detector import expand_inputs
+from model_session import CLASSES, INPUT_SHAPE, MODEL_VARIANTS, ModelSession, decode_image, model_version
+
+REDUCED_PRECISIONS = ('float16', 'int8')
+
+
+def class_label(path):
+    """Class index from the image's parent directory name, or None if it is not a class."""
+    names = {''.join(filter(str.isalnum, name.lower())): i for i, name in enumerate(CLASSES)}
+    parent = os.path.basename(os.path.dirname(path))
+    return names.get(''.join(filter(str.isalnum, parent.lower())))
+
+
+def load_images(paths):
+    """Decode paths into one uint8 array, skipping files that fail to decode."""
+    images, kept = [], []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                images.append(decode_image(f.read()))
+            kept.append(path)
+        except Exception as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+    return np.stack(images) if images else np.empty((0, *INPUT_SHAPE), dtype=np.uint8), kept
+
+
+def sample(paths, size, seed):
+    if size and len(paths) > size:
+        return sorted(random.Random(seed).sample(paths, size))
+    return paths
+
+
+def convert(model, precision, calibration_images=None):
+    """
+    Convert a Keras model to TFLite at the given precision.
+
+    Returns:
+        bytes: The .tflite flatbuffer
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if precision == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif precision == 'int8':
+        if calibration_images is None or not len(calibration_images):
+            raise ValueError("int8 conversion needs calibration images")
+
+        def representative_dataset():
+            # Same scaling the serving path applies before the model
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32) / 255.0]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown precision {precision!r}, use one of {REDUCED_PRECISIONS}")
+
+    return converter.convert()
+
+
+def predict_all(session, images, batch_size=32):
+    return np.concatenate([session.predict(images[i:i + batch_size])
+                           for i in range(0, len(images), batch_size)])
+
+
+def latency_ms(session, images, runs=50):
+    """Median single-image latency in milliseconds."""
+    timings = []
+    for image in images[:runs]:
+        started = time.perf_counter()
+        session.predict(image[np.newaxis])
+        timings.append(time.perf_counter() - started)
+    return round(float(np.median(timings)) * 1e3, 3) if timings else None
+
+
+def compare(session, path, images, reference, labels):
+    """Parity of one model against the float32 reference predictions."""
+    probabilities = predict_all(session, images)
+    diff = np.abs(probabilities - reference) * 100  # in confidence percentage points
+    result = {
+        'path': path,
+        'size_bytes': os.path.getsize(path),
+        'top1_agreement': round(float(np.mean(probabilities.argmax(1) == reference.argmax(1))), 4),
+        'max_abs_diff_pct': round(float(diff.max()), 4),
+        'mean_abs_diff_pct': round(float(diff.mean()), 4),
+        'latency_ms_p50': latency_ms(session, images)
+    }
+
+    labelled = labels >= 0
+    if labelled.any():
+        predicted = probabilities.argmax(1)[labelled]
+        result['accuracy'] = round(float(np.mean(predicted == labels[labelled])), 4)
+    return result
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Build float16/int8 TFLite variants of the MRI model")
+    parser.add_argument("--model", default=MODEL_VARIANTS['float32'], help="float32 Keras model")
+    parser.add_argument("--calibration", nargs="+", required=True,
+                        help="Representative scans for int8 calibration (files, directories or globs)")
+    parser.add_argument("--calibration-size", type=int, default=300, help="Calibration images to sample")
+    parser.add_argument("--eval", nargs="+", help="Scans for the parity report (default: the calibration set)")
+    parser.add_argument("--eval-size", type=int, default=1000, help="Evaluation images to sample")
+    parser.add_argument("--precisions", default=",".join(REDUCED_PRECISIONS), help="Comma-separated variants to build")
+    parser.add_argument("--output-dir", default=".", help="Where to write the .tflite files")
+    parser.add_argument("--report", default="quantization_report.json", help="Parity report path")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    precisions = [p for p in args.precisions.split(',') if p]
+    unknown = set(precisions) - set(REDUCED_PRECISIONS)
+    if unknown:
+        print(f"Error: unknown precisions {sorted(unknown)}, use {REDUCED_PRECISIONS}", file=sys.stderr)
+        return 2
+
+    calibration_paths = sample(expand_inputs(args.calibration), args.calibration_size, args.seed)
+    calibration_images, calibration_paths = load_images(calibration_paths)
+    if not len(calibration_images):
+        print("Error: no calibration images found", file=sys.stderr)
+        return 2
+
+    if args.eval:
+        eval_images, eval_paths = load_images(sample(expand_inputs(args.eval), args.eval_size, args.seed))
+    else:
+        eval_images, eval_paths = calibration_images, calibration_paths
+    labels = np.array([-1 if (label := class_label(path)) is None else label for path in eval_paths])
+
+    reference_session = ModelSession(args.model).load()
+    reference = predict_all(reference_session, eval_images)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'model': args.model,
+        'model_version': reference_session.version,
+        'calibration_images': len(calibration_images),
+        'eval_images': len(eval_images),
+        'labelled_eval_images': int((labels >= 0).sum()),
+        'variants': {'float32': compare(reference_session, args.model, eval_images, reference, labels)}
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for precision in precisions:
+        path = os.path.join(args.output_dir, MODEL_VARIANTS[precision])
+        with open(path, 'wb') as f:
+            f.write(convert(reference_session.model, precision, calibration_images))
+
+        session = ModelSession(path).load()
+        report['variants'][precision] = compare(session, path, eval_images, reference, labels)
+        report['variants'][precision]['source_version'] = reference_session.version
+        report['variants'][precision]['version'] = model_version(path)
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'variant':10} {'size KB':>10} {'top-1 agree':>12} {'max diff %':>11} "
+          f"{'p50 ms':>8} {'accuracy':>9}")
+    for name, result in report['variants'].items():
+        accuracy = result.get('accuracy')
+        print(f"{name:10} {result['size_bytes'] / 1024:>10.1f} {result['top1_agreement']:>12.4f} "
+              f"{result['max_abs_diff_pct']:>11.4f} {result['latency_ms_p50']:>8} "
+              f"{'-' if accuracy is None else f'{accuracy:.4f}':>9}")
+    print(f"\nWrote {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import functools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from healthcare_common.metrics import stage
+from model_session import CLASSES, decode_image, format_prediction
+from upload_store import content_hash
+
+logger = logging.getLogger(__name__)
+
+NO_TUMOR = 'No Tumor'
+
+
+def summarize_study(slices):
+    """
+    Study-level result from the finished slices.
+
+    The study is called for a tumor class when any slice shows one: the tumor
+    class predicted on the most slices wins, ties going to the higher mean
+    confidence. Only when no slice shows a tumor is the study 'No Tumor'.
+
+    Returns:
+        dict: prediction, per-class slice counts, mean and max confidences
+    """
+    scored = [s for s in slices if s['prediction'] is not None]
+    if not scored:
+        return None
+
+    scores = np.array([[s['confidence_scores'][name] for name in CLASSES] for s in scored])
+    mean_confidence = dict(zip(CLASSES, scores.mean(axis=0).round(4).tolist()))
+    max_confidence = dict(zip(CLASSES, scores.max(axis=0).round(4).tolist()))
+    slice_counts = {name: sum(s['prediction'] == name for s in scored) for name in CLASSES}
+
+    tumors = [name for name in CLASSES if name != NO_TUMOR and slice_counts[name]]
+    if tumors:
+        prediction = max(tumors, key=lambda name: (slice_counts[name], mean_confidence[name]))
+    else:
+        prediction = NO_TUMOR
+
+    return {
+        'prediction': prediction,
+        'slices_scored': len(scored),
+        'slice_counts': slice_counts,
+        'mean_confidence': mean_confidence,
+        'max_confidence': max_confidence
+    }
+
+
+class StudyQueueFull(Exception):
+    """Raised by StudyJobManager.submit() while too many studies are in progress."""
+
+
+class ZipStudy:
+    """
+    A zipped study, checked on upload and decompressed slice by slice later.
+
+    The upload is copied to a temporary file and only the archive's directory
+    is read in the request: the members are filtered, counted and their
+    uncompressed sizes summed. Each slice is decompressed by the job worker
+    that processes it, so corrupt members fail that slice, not the upload.
+    Directories, hidden files and files with other extensions are skipped.
+    """
+
+    def __init__(self, stream, extensions, max_slices, max_bytes):
+        """
+        Raises:
+            ValueError: The upload is not a zip, or it holds more than max_slices
+                images or max_bytes of uncompressed image data
+        """
+        self._file = tempfile.TemporaryFile()
+        try:
+            shutil.copyfileobj(stream, self._file)
+            self._file.seek(0)
+            self._archive = zipfile.ZipFile(self._file)
+        except zipfile.BadZipFile as e:
+            self._file.close()
+            raise ValueError(f"Invalid zip file: {e}")
+
+        members = [
+            info for info in self._archive.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith('.')
+            and '__MACOSX' not in info.filename
+            and info.filename.rsplit('.', 1)[-1].lower() in extensions
+        ]
+        try:
+            if len(members) > max_slices:
+                raise ValueError(f"Study has {len(members)} slices, the limit is {max_slices}")
+            if sum(info.file_size for info in members) > max_bytes:
+                raise ValueError(f"Study is larger than {max_bytes // (1024 * 1024)}MB uncompressed")
+        except ValueError:
+            self.close()
+            raise
+        self._members = sorted(members, key=lambda info: info.filename)
+
+    def slices(self):
+        """(name, loader) pairs in file name order; loader() decompresses the slice."""
+        return [(info.filename, functools.partial(self._archive.read, info)) for info in self._members]
+
+    def close(self):
+        self._archive.close()
+        self._file.close()
+
+
+class StudyJob:
+    """
+    One multi-slice study moving through decode and batched inference.
+
+    Slice results are appended to an event log as they finish, so pollers
+    read a snapshot and streams replay the log from any position.
+    """
+
+    def __init__(self, names, model_version, on_done=None):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at = None
+        self.model_version = model_version
+        self.slices = [
+            {'index': i, 'name': name, 'status': 'queued', 'prediction': None,
+             'confidence_scores': None, 'image_id': None, 'cached': False, 'error': None}
+            for i, name in enumerate(names)
+        ]
+        self.events = []
+        self._on_done = on_done
+        self._remaining = len(names)
+        self._changed = threading.Condition()
+
+    @property
+    def total(self):
+        return len(self.slices)
+
+    @property
+    def completed(self):
+        return len(self.slices) - self._remaining
+
+    @property
+    def done(self):
+        return self._remaining == 0
+
+    @property
+    def status(self):
+        if self.done:
+            return 'done'
+        return 'running' if any(s['status'] != 'queued' for s in self.slices) else 'queued'
+
+    def record(self, index, **fields):
+        """Store one finished slice and wake up streams waiting on this job."""
+        with self._changed:
+            self.slices[index].update(fields)
+            self.events.append(('slice', dict(self.slices[index])))
+            self._remaining -= 1
+            finished = self._remaining == 0
+            if finished:
+                self.finished_at = time.time()
+                self.events.append(('study', self.snapshot(include_slices=False)))
+            self._changed.notify_all()
+        if finished and self._on_done is not None:
+            self._on_done()
+
+    def wait_for_events(self, position, timeout=None):
+        """Block until there are events after position or the timeout passes."""
+        with self._changed:
+            if len(self.events) <= position and not self.done:
+                self._changed.wait(timeout)
+            return self.events[position:]
+
+    def snapshot(self, include_slices=True):
+        result = {
+            'job_id': self.id,
+            'status': self.status,
+            'model_version': self.model_version,
+            'total_slices': self.total,
+            'completed_slices': self.completed,
+            'failed_slices': sum(s['status'] == 'failed' for s in self.slices),
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'study': summarize_study(self.slices) if self.done else None
+        }
+        if include_slices:
+            result['slices'] = [dict(s) for s in self.slices]
+        return result
+
+
+class StudyJobManager:
+    """
+    Runs study jobs on a background decode pool feeding the shared micro-batcher.
+
+    Pool threads decode slices and block on the batcher, so up to `workers`
+    slices from one or several studies are batched into each model call.
+    At most `max_active` studies are in progress at once; further ones are
+    refused with StudyQueueFull. Finished jobs are kept for `ttl` seconds,
+    at most `max_jobs` at a time.
+    """
+
+    def __init__(self, batcher, prediction_cache=None, version_fn=None, workers=8, max_jobs=200, ttl=3600,
+                 max_active=4):
+        self.batcher = batcher
+        self.prediction_cache = prediction_cache
+        self.version_fn = version_fn or (lambda: None)
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.max_active = max_active
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='study-worker')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def full(self):
+        """True while max_active studies are in progress; callers turn the study away, so it counts as rejected."""
+        with self._lock:
+            full = self._active() >= self.max_active
+            if full:
+                self.rejected += 1
+            return full
+
+    def _active(self):
+        return sum(not job.done for job in self._jobs.values())
+
+    def submit(self, slices, on_done=None):
+        """
+        Queue a study and return immediately.
+
+        Args:
+            slices (list): (name, encoded image bytes or a callable returning
+                them) pairs, in slice order
+            on_done (callable, optional): Called once every slice has finished,
+                e.g. to release the uploaded archive
+
+        Returns:
+            StudyJob: The queued job
+
+        Raises:
+            StudyQueueFull: max_active studies are already in progress
+        """
+        job = StudyJob([name for name, _ in slices], self.version_fn(), on_done=on_done)
+        with self._lock:
+            if self._active() >= self.max_active:
+                self.rejected += 1
+                raise StudyQueueFull(f"{self.max_active} studies are already being processed")
+            self._expire()
+            self._jobs[job.id] = job
+        for index, (_, data) in enumerate(slices):
+            self._pool.submit(self._process, job, index, data)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _process(self, job, index, data):
+        job.slices[index]['status'] = 'running'
+        try:
+            if callable(data):
+                with stage('study_unzip'):
+                    data = data()
+            digest = content_hash(data)
+            result = None
+            if self.prediction_cache is not None:
+                self.prediction_cache.bind(job.model_version)
+                result = self.prediction_cache.get(digest)
+            cached = result is not None
+            if not cached:
+                with stage('study_decode'):
+                    image = decode_image(data)
+                with stage('study_inference'):
+                    result = format_prediction(self.batcher.predict(image))
+                if self.prediction_cache is not None:
+                    self.prediction_cache.put(digest, result, version=job.model_version)
+
+            predicted_class, confidence_scores = result
+            job.record(index, status='done', prediction=predicted_class,
+                       confidence_scores=confidence_scores, image_id=digest, cached=cached)
+        except Exception as e:
+            logger.error(f"Slice {index} of study {job.id} failed: {e}")
+            job.record(index, status='failed', error=str(e))
+
+    def _expire(self):
+        """Drop finished jobs past their TTL, then the oldest ones over max_jobs."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            'jobs': len(jobs),
+            'running': sum(not job.done for job in jobs),
+            'max_active': self.max_active,
+            'rejected': self.rejected,
+            'pending_slices': sum(job.total - job.completed for job in jobs)
+        }
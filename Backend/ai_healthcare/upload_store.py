@@ -0,0 +1,198 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SUFFIX = '.preview.jpg'
+
+
+def content_hash(data):
+    """SHA-256 hex digest of the upload bytes, used as its storage name."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_preview(data, size=256, quality=85):
+    """Downscale an encoded image to a JPEG that fits in size x size pixels."""
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode not in ('L', 'RGB'):
+            img = img.convert('RGB')
+        img.thumbnail((size, size))
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class UploadStore:
+    """
+    Content-addressed, size- and age-bounded storage for uploaded scans.
+
+    Every upload gets a small JPEG preview stored as <sha256>.preview.jpg
+    (and, with keep_originals, the original as <sha256>.<extension>), so two
+    different files with the same client filename never collide, the same
+    scan is written only once, and a stored file never changes under its
+    name. Writes run on a small background pool, through a temporary file
+    and an atomic rename.
+
+    The store keeps an in-memory LRU index of its files. After every write,
+    files not served for max_age seconds are removed, then the least
+    recently used ones until the folder fits in max_bytes. A value of 0
+    disables either limit.
+    """
+
+    def __init__(self, folder, max_bytes=0, max_age=0, preview_size=256, keep_originals=False, max_writers=2):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.preview_size = preview_size
+        self.keep_originals = keep_originals
+        self.evictions = 0
+        self._writer = ThreadPoolExecutor(max_workers=max_writers, thread_name_prefix='upload-writer')
+        self._pending = {}  # filename -> Future of the write in progress
+        self._files = OrderedDict()  # filename -> (size in bytes, last use), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def filename(digest, extension):
+        return f"{digest}.{extension.lower()}"
+
+    @staticmethod
+    def preview_filename(digest):
+        return f"{digest}{PREVIEW_SUFFIX}"
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _scan(self):
+        """Index the files already on disk, oldest first, and apply the budget."""
+        entries = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            if entry.name.endswith('.tmp'):
+                # Left behind by an interrupted write
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        with self._lock:
+            for mtime, name, size in sorted(entries):
+                self._files[name] = (size, mtime)
+                self._bytes += size
+            self._evict()
+
+    def _write(self, data, filename):
+        filepath = self.path(filename)
+        # Write to a temporary name first so the preview route never serves a partial file
+        temp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, filepath)
+
+        with self._lock:
+            previous = self._files.pop(filename, None)
+            if previous:
+                self._bytes -= previous[0]
+            self._files[filename] = (len(data), time.time())
+            self._bytes += len(data)
+
+    def _store(self, data, digest, extension):
+        self._write(make_preview(data, self.preview_size), self.preview_filename(digest))
+        if self.keep_originals:
+            self._write(data, self.filename(digest, extension))
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """Remove expired, then least recently used files; the caller holds the lock."""
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            for name, (_, last_used) in list(self._files.items()):
+                if last_used >= cutoff:
+                    break
+                self._remove(name)
+        while self.max_bytes and self._bytes > self.max_bytes and self._files:
+            self._remove(next(iter(self._files)))
+
+    def _remove(self, name):
+        size, _ = self._files.pop(name)
+        self._bytes -= size
+        self.evictions += 1
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def save_async(self, data, digest, extension):
+        """
+        Store an upload's preview (and original) in the background unless already stored.
+
+        Returns:
+            str: The preview filename
+        """
+        preview = self.preview_filename(digest)
+        names = [preview]
+        if self.keep_originals:
+            names.append(self.filename(digest, extension))
+
+        with self._lock:
+            if all(name in self._files or name in self._pending for name in names):
+                return preview
+            future = self._writer.submit(self._store, data, digest, extension)
+            for name in names:
+                self._pending[name] = future
+
+        def done(f):
+            with self._lock:
+                for name in names:
+                    if self._pending.get(name) is f:
+                        del self._pending[name]
+            if f.exception():
+                logger.error(f"Failed to save upload {digest}: {f.exception()}")
+
+        future.add_done_callback(done)
+        return preview
+
+    def wait_for(self, filename, timeout=5):
+        """Block until a pending write of filename (if any) has finished."""
+        with self._lock:
+            pending = self._pending.get(filename)
+        if pending is not None:
+            wait([pending], timeout=timeout)
+
+    def touch(self, filename):
+        """
+        Mark a file as just used, for LRU eviction.
+
+        Returns:
+            bool: True if the file is in the store
+        """
+        with self._lock:
+            entry = self._files.get(filename)
+            if entry is None:
+                return False
+            self._files[filename] = (entry[0], time.time())
+            self._files.move_to_end(filename)
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'evictions': self.evictions,
+                'pending_writes': len(set(self._pending.values()))
+            }
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from query_router import MEDICATIONS
+
+logger = logging.getLogger(__name__)
+
+# Words that change how a question is phrased but not what it asks
+STOPWORDS = frozenset("""
+    a an the is are am was were be been being of for to in on at by and or as
+    what whats which who how do does did can could would should may might will
+    i im me my you your we our it its this that these those there please kindly
+    tell explain know want need help hi hello hey thanks thank about some any
+""".split())
+
+# Tokens that must match exactly for two questions to share an answer: they
+# change who or what the answer is for while moving the similarity very
+# little ("dosage for a child" and "dosage for an adult" differ by one word)
+GUARDED = frozenset("""
+    no not never without dont cant shouldnt wont isnt avoid
+    child children kid kids baby babies infant infants toddler toddlers newborn newborns
+    teen teens teenager teenagers adolescent adolescents adult adults
+    elderly senior seniors old older young younger age aged year years month months
+    pregnant pregnancy trimester breastfeeding nursing lactating
+    weight weighing kg kgs lb lbs pound pounds mg mcg ml gram grams
+    male female man men woman women boy girl
+    kidney liver heart diabetic diabetes asthma allergic allergy
+""".split()) | frozenset(MEDICATIONS)
+
+
+def normalize_query(text):
+    """
+    Canonical form of a question: lowercase words without punctuation and stopwords.
+
+    "What is the dosage of Crocin?" and "crocin dosage" both become word
+    lists over the same tokens; word order is kept.
+    """
+    text = unicodedata.normalize('NFKC', text).lower().replace("'", '')
+    return ' '.join(token for token in re.findall(r'\w+', text) if token not in STOPWORDS)
+
+
+def shingles(normalized):
+    """Single words plus adjacent word pairs of a normalized query."""
+    tokens = normalized.split()
+    return frozenset(tokens) | frozenset(' '.join(pair) for pair in zip(tokens, tokens[1:]))
+
+
+def _guard(normalized):
+    """Numbers, negations, population, condition and drug terms a near-duplicate must share."""
+    return frozenset(token for token in normalized.split() if token in GUARDED or token.isdigit())
+
+
+def prompt_fingerprint(system_prompt):
+    return hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest()[:12]
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of model answers, keyed on the normalized question.
+
+    Entries live in a scope of (model, routing category, system prompt
+    fingerprint), so an answer is only reused for the same model asked the
+    same way. A lookup tries the exact normalized question. Near matching is
+    opt-in: with `similarity` below 1 a miss then tries the most similar
+    cached question by Jaccard similarity of word and word-pair shingles,
+    accepted at `similarity` or above and only if both mention the same
+    GUARDED terms (negations, age groups, pregnancy, weights and units,
+    conditions, drug names) and numbers. A medical answer differing in one
+    of those may be wrong for the asker, so the default (1) only reuses
+    answers to the same question.
+
+    Entries expire `ttl` seconds after they were generated. With a `path`,
+    every new answer is appended to a JSON lines file that is reloaded on
+    start and compacted when it grows to twice maxsize.
+    """
+
+    def __init__(self, maxsize=1000, ttl=86400, similarity=1.0, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.path = path
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0  # generation time of every answer served from the cache
+        self._entries = OrderedDict()  # (scope, normalized) -> entry dict, least recently used first
+        self._index = {}  # (scope, shingle) -> set of normalized queries
+        self._log_lines = 0
+        self._lock = threading.Lock()
+        if path and maxsize > 0:
+            self._load()
+
+    @staticmethod
+    def scope(model, category, system_prompt=None):
+        return f"{model}|{category}|{prompt_fingerprint(system_prompt)}"
+
+    def _expired(self, entry, now):
+        return self.ttl and entry['created_at'] + self.ttl < now
+
+    def _insert(self, key, entry):
+        """Add or replace an entry and index its shingles; the caller holds the lock."""
+        if key in self._entries:
+            self._discard(key)
+        entry['shingles'] = shingles(key[1])
+        entry['guard'] = _guard(key[1])
+        self._entries[key] = entry
+        scope, normalized = key
+        for shingle in entry['shingles']:
+            self._index.setdefault((scope, shingle), set()).add(normalized)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key)
+        scope, normalized = key
+        for shingle in entry['shingles']:
+            keys = self._index.get((scope, shingle))
+            if keys is not None:
+                keys.discard(normalized)
+                if not keys:
+                    del self._index[(scope, shingle)]
+
+    def _nearest(self, scope, normalized, now):
+        """Most similar live entry in the scope at or above the threshold; the caller holds the lock."""
+        query = shingles(normalized)
+        if not query or self.similarity >= 1:
+            return None
+        overlap = {}
+        for shingle in query:
+            for candidate in self._index.get((scope, shingle), ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        guard = _guard(normalized)
+        best, best_score = None, self.similarity
+        for candidate, shared in overlap.items():
+            entry = self._entries[(scope, candidate)]
+            score = shared / (len(query) + len(entry['shingles']) - shared)
+            if score >= best_score and entry['guard'] == guard and not self._expired(entry, now):
+                best, best_score = (scope, candidate), score
+        return best
+
+    def get(self, query, scope):
+        """
+        Cached answer for a question, or None on a miss.
+
+        Args:
+            query (str): The question as the user typed it
+            scope (str): From scope()
+
+        Returns:
+            str: The answer, or None
+        """
+        if self.maxsize <= 0:
+            return None
+        normalized = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            key = (scope, normalized)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._discard(key)
+                entry = None
+            if entry is None:
+                key = self._nearest(scope, normalized, now)
+                if key is None:
+                    self.misses += 1
+                    return None
+                entry = self._entries[key]
+                self.near_hits += 1
+            else:
+                self.hits += 1
+            self._entries.move_to_end(key)
+            self.saved_seconds += entry['generation_seconds']
+            return entry['answer']
+
+    def put(self, query, scope, answer, generation_seconds=0.0):
+        """Store a freshly generated answer, with how long it took to generate."""
+        if self.maxsize <= 0 or not answer:
+            return
+        normalized = normalize_query(query)
+        if not normalized:
+            return
+        entry = {'answer': answer, 'generation_seconds': generation_seconds, 'created_at': time.time()}
+        with self._lock:
+            self._insert((scope, normalized), entry)
+            if self.path:
+                self._append(scope, normalized, entry)
+
+    def _record(self, scope, normalized, entry):
+        return json.dumps({'scope': scope, 'query': normalized, 'answer': entry['answer'],
+                           'generation_seconds': entry['generation_seconds'],
+                           'created_at': entry['created_at']}) + '\n'
+
+    def _append(self, scope, normalized, entry):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(self._record(scope, normalized, entry))
+            self._log_lines += 1
+            if self._log_lines > 2 * self.maxsize:
+                self._compact()
+        except OSError as e:
+            logger.error(f"Failed to persist answer cache to {self.path}: {e}")
+
+    def _compact(self):
+        """Rewrite the file with the live entries only; the caller holds the lock."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for (scope, normalized), entry in self._entries.items():
+                f.write(self._record(scope, normalized, entry))
+        os.replace(temp_path, self.path)
+        self._log_lines = len(self._entries)
+
+    def _load(self):
+        """Replay the persisted answers, skipping expired and unreadable lines."""
+        if not os.path.exists(self.path):
+            return
+        now = time.time()
+        with self._lock:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    self._log_lines += 1
+                    try:
+                        record = json.loads(line)
+                        entry = {'answer': record['answer'],
+                                 'generation_seconds': float(record['generation_seconds']),
+                                 'created_at': float(record['created_at'])}
+                        key = (record['scope'], record['query'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if not self._expired(entry, now):
+                        self._insert(key, entry)
+            self.evictions = 0
+        logger.info(f"Loaded {len(self._entries)} cached answers from {self.path}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            if self.path and os.path.exists(self.path):
+                self._compact()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for /api/cache/stats and /metrics."""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'similarity': self.similarity,
+                'persistent': bool(self.path),
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+                'saved_seconds': round(self.saved_seconds, 3)
+            }
@@ -1,7 +1,9 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
+import json
 import logging
-from utils import run_ollama_model, get_medical_system_prompt
+from utils import run_ollama_model, stream_ollama_model, get_medical_system_prompt, answer_cache, sessions, Overloaded, ERROR_RESPONSE
+from healthcare_common.metrics import instrument_app
 import os
 
 # Configure logging
@@ -13,6 +15,7 @@ app = Flask(__name__,
     static_folder='static'
 )
 CORS(app)
+instrument_app(app)  # Request/stage latency at GET /metrics
 
 @app.route('/')
 def index():
@@ -34,15 +37,80 @@ def chat():
         if not user_message:
             return jsonify({'response': 'Please enter a message.'}), 400
         
+        # Continue the client's conversation, or start one
+        session = sessions.get_or_create(data.get('session_id'))
+        
         # Get response from Ollama model with medical system prompt
         system_prompt = get_medical_system_prompt()
-        response = run_ollama_model(user_message, system_prompt)
+        response = run_ollama_model(user_message, system_prompt, session)
         
-        return jsonify({'response': response})
+        return jsonify({'response': response, 'session_id': session.id})
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         return jsonify({'response': 'An error occurred processing your request.'}), 500
 
+def overloaded_response(e):
+    """429 with a retry hint: shed load quickly instead of letting the request time out"""
+    return jsonify({
+        'response': 'The assistant is busy right now. Please try again in a moment.',
+        'retry_after': e.retry_after
+    }), 429, {'Retry-After': str(e.retry_after)}
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream the response as server-sent events while it is generated.
+
+    Events: 'token' ({"content": ...}) for each chunk, then 'done'
+    ({"session_id": ...}), or 'error' if the generation fails part way. When the client disconnects
+    the response iterator is closed, which cancels the generation in Ollama.
+    """
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+
+    if not user_message:
+        return jsonify({'response': 'Please enter a message.'}), 400
+
+    session = sessions.get_or_create(data.get('session_id'))
+    try:
+        chunks = stream_ollama_model(user_message, get_medical_system_prompt(), session)
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    def generate():
+        try:
+            for chunk in chunks:
+                yield sse_event('token', {'content': chunk})
+            yield sse_event('done', {'session_id': session.id})
+        except Exception:
+            yield sse_event('error', {'response': ERROR_RESPONSE})
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+    })
+    # Runs when the server closes the response, also when the client went away before the first token
+    response.call_on_close(chunks.close)
+    return response
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """Forget a conversation"""
+    if not sessions.delete(session_id):
+        return jsonify({'error': 'Unknown session'}), 404
+    return '', 204
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Answer cache hit ratio and generation time saved"""
+    return jsonify(answer_cache.stats())
+
 if __name__ == '__main__':
     # Create necessary directories if they don't exist
     os.makedirs('static', exist_ok=True)
@@ -51,4 +119,4 @@ if __name__ == '__main__':
     logger.info("🏥 Medical Assistant Chatbot")
     logger.info("----------------------------")
     logger.info("Server running at http://localhost:8080")
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8080, debug=True, threaded=True)
\ No newline at end of file
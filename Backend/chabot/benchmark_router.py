@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of chat query routing.
+
+Compares the compiled QueryRouter against the routing it replaced (the
+17 re.search calls and keyword scans of is_medical_query, followed by the
+medication/symptom/treatment prompt chain, kept below as legacy_route)
+on a reproducible message workload: medical questions, questions matched
+only by a pattern, small talk and long messages.
+
+Every message is first checked to route identically on both, then both
+are timed. Results are written as JSON.
+
+Example:
+    python benchmark_router.py --messages 20000
+"""
+
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from query_router import MEDICAL_KEYWORDS, QueryRouter
+
+SAMPLE_MESSAGES = [
+    "What is the dosage of crocin for adults?",
+    "I have a headache and fever since yesterday",
+    "How to treat a sprained ankle",
+    "Is ibuprofen safe during pregnancy?",
+    "what are the side effects of metformin",
+    "Should I see a doctor for a persistent cough?",
+    "My stomach hurts after eating",
+    "Can I take paracetamol with coffee?",
+    "what does a high blood pressure reading mean",
+    "I've been feeling anxious and can't sleep",
+    "How long does the flu last",
+    "Is chickenpox contagious",
+    "what causes migraines",
+    "Tell me a joke",
+    "What's the weather like today?",
+    "Who won the football match last night",
+    "Write a poem about the sea",
+    "hello there",
+    "How do I bake sourdough bread",
+    "Recommend a good movie for the weekend",
+    "what is the capital of France",
+    "Translate good morning into Spanish",
+    "Is this normal?",
+    "why do I always feel tired in the afternoon",
+]
+
+FILLER = ("please", "quickly", "my", "friend", "said", "yesterday", "and", "also", "really",
+          "the", "for", "a", "with", "about", "today", "again", "some", "very", "after")
+
+SMALL_TALK = ("weather", "football", "movie", "recipe", "holiday", "music", "traffic",
+              "programming", "history", "garden", "travel", "price", "phone", "laptop")
+
+
+def legacy_route(query):
+    """The routing used before QueryRouter, unchanged, as the reference."""
+    medical_keywords = set(MEDICAL_KEYWORDS)
+    medical_patterns = [
+        r'how (to|do I|should I) treat',
+        r'what (is|are) the (symptoms|signs|causes|treatments|side effects)',
+        r'(how|when) (to|should I) take',
+        r'(is|are) .* (safe|effective|dangerous)',
+        r'can I take',
+        r'should I see a doctor',
+        r'what does .* (mean|indicate)',
+        r'why (do|does|am I) .* (feel|have|experiencing)',
+        r'(how long|when) (will|does|should)',
+        r'(is|are) .* (normal|serious|dangerous|concerning)',
+        r'(what|how) (is|are) the (risks|benefits|effects)',
+        r'(how|what) (can|should) I do (about|for|to treat)',
+        r'(what|which) medicine',
+        r'(how|what) causes',
+        r'(is|can) .* (contagious|infectious|hereditary)',
+        r'(what|how) (is|are) the (dosage|dose|prescription)',
+        r'(how|what) (is|are) the recommended'
+    ]
+
+    query_lower = query.lower()
+    medical = False
+    for pattern in medical_patterns:
+        if re.search(pattern, query_lower):
+            medical = True
+            break
+    if not medical:
+        words = set(re.findall(r'\w+', query_lower))
+        medical = any(keyword.lower() in words or keyword.lower() in query_lower for keyword in medical_keywords)
+
+    if any(med in query.lower() for med in ['tablet', 'medicine', 'drug', 'dosage', 'crocin', 'prescription']):
+        category = 'medication'
+    elif any(symptom in query.lower() for symptom in ['pain', 'ache', 'fever', 'symptoms', 'feeling']):
+        category = 'symptom'
+    elif 'treat' in query.lower() or 'treatment' in query.lower():
+        category = 'treatment'
+    else:
+        category = 'general'
+    return medical, category
+
+
+def generate_workload(size=10000, seed=0, medical=0.5, long_fraction=0.1):
+    """
+    Build a reproducible list of chat messages.
+
+    Args:
+        size (int): Number of messages
+        seed (int): Random seed
+        medical (float): Fraction of messages built around a medical keyword
+        long_fraction (float): Fraction of messages around 80 words long
+
+    Returns:
+        list: Messages
+    """
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(size):
+        if rng.random() < 0.2:
+            message = rng.choice(SAMPLE_MESSAGES)
+        else:
+            length = rng.randint(60, 100) if rng.random() < long_fraction else rng.randint(3, 14)
+            words = [rng.choice(FILLER + SMALL_TALK) for _ in range(length)]
+            if rng.random() < medical:
+                words.insert(rng.randrange(len(words) + 1), rng.choice(MEDICAL_KEYWORDS))
+            message = ' '.join(words)
+            if rng.random() < 0.3:
+                message = message.capitalize() + '?'
+        workload.append(message)
+    return workload
+
+
+def measure(func, inputs, warmup=200):
+    """
+    Time func(x) for every x in inputs.
+
+    Returns:
+        dict: Latency percentiles in microseconds and throughput per second
+    """
+    for x in inputs[:warmup]:
+        func(x)
+
+    latencies = []
+    started = time.perf_counter()
+    for x in inputs:
+        t0 = time.perf_counter()
+        func(x)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    latencies_us = sorted(latency * 1e6 for latency in latencies)
+    percentile = lambda q: round(latencies_us[min(int(q * len(latencies_us)), len(latencies_us) - 1)], 2)
+    return {
+        'calls': len(inputs),
+        'mean_us': round(statistics.fmean(latencies_us), 2),
+        'p50_us': percentile(0.5),
+        'p90_us': percentile(0.9),
+        'p99_us': percentile(0.99),
+        'throughput_per_s': round(len(inputs) / elapsed, 1)
+    }
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark chat query routing")
+    parser.add_argument("--messages", type=int, default=10000, help="Messages in the workload")
+    parser.add_argument("--seed", type=int, default=0, help="Workload random seed")
+    parser.add_argument("--output", default="router_benchmark.json", help="Where to write the JSON results")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    workload = generate_workload(args.messages, args.seed)
+
+    started = time.perf_counter()
+    router = QueryRouter()
+    compile_ms = round((time.perf_counter() - started) * 1e3, 3)
+
+    mismatches = [m for m in workload if tuple(router.route(m)) != legacy_route(m)]
+    if mismatches:
+        print(f"Error: {len(mismatches)} messages route differently, e.g.:", file=sys.stderr)
+        for message in mismatches[:5]:
+            print(f"  {message!r}: legacy {legacy_route(message)}, router {tuple(router.route(message))}",
+                  file=sys.stderr)
+        return 1
+
+    medical_messages = [m for m in workload if legacy_route(m)[0]]
+    other_messages = [m for m in workload if not legacy_route(m)[0]]
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'messages': len(workload),
+        'medical_messages': len(medical_messages),
+        'router_compile_ms': compile_ms,
+        'benchmarks': {}
+    }
+    for subset, messages in (('all', workload), ('medical', medical_messages), ('non_medical', other_messages)):
+        legacy = measure(legacy_route, messages)
+        compiled = measure(router.route, messages)
+        results['benchmarks'][subset] = {
+            'legacy': legacy,
+            'router': compiled,
+            'speedup_mean': round(legacy['mean_us'] / compiled['mean_us'], 2)
+        }
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    print(f"Routing identical on all {len(workload)} messages; router compiled in {compile_ms} ms\n")
+    print(f"{'messages':12} {'legacy p50 us':>14} {'router p50 us':>14} {'legacy p99 us':>14} "
+          f"{'router p99 us':>14} {'speedup':>8}")
+    for subset, result in results['benchmarks'].items():
+        print(f"{subset:12} {result['legacy']['p50_us']:>14} {result['router']['p50_us']:>14} "
+              f"{result['legacy']['p99_us']:>14} {result['router']['p99_us']:>14} "
+              f"{result['speedup_mean']:>7}x")
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Rough size of a token for English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message):
+    """Approximate prompt tokens taken by one chat message."""
+    return len(message['content']) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatSession:
+    """
+    One conversation: the turns sent to the model, within a token budget.
+
+    Turns are stored exactly as they were sent and generated, so the
+    history plus the next question extends the previous prompt and the
+    model server can reuse its cached prefix. When the history grows past
+    history_tokens, the oldest turns are dropped until it is under half the
+    budget; dropping in blocks keeps the prefix unchanged for many turns in
+    between. The questions of dropped turns are kept in a short summary
+    message of at most summary_tokens, placed before the remaining turns.
+    """
+
+    def __init__(self, history_tokens=1024, summary_tokens=200, session_id=None):
+        self.id = session_id or uuid.uuid4().hex
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.truncations = 0
+        self._turns = []  # (user message, assistant message, tokens, question)
+        self._tokens = 0
+        self._dropped_questions = []
+        self._summary = None
+        self._lock = threading.Lock()
+
+    @property
+    def turns(self):
+        return len(self._turns)
+
+    def has_history(self):
+        return bool(self._turns or self._summary)
+
+    def history(self):
+        """
+        Messages to put between the system prompt and the next question.
+
+        Returns:
+            list: A summary message (once turns were dropped), then the kept turns
+        """
+        with self._lock:
+            messages = [self._summary] if self._summary else []
+            for user, assistant, _, _ in self._turns:
+                messages += [user, assistant]
+            return messages
+
+    def add_turn(self, user_message, answer, question=None):
+        """
+        Record a finished exchange, truncating the history if it is over budget.
+
+        Args:
+            user_message (dict): The user message exactly as it was sent
+            answer (str): The model's full answer
+            question (str, optional): The question as typed, for the summary
+        """
+        assistant_message = {'role': 'assistant', 'content': answer}
+        tokens = estimate_tokens(user_message) + estimate_tokens(assistant_message)
+        with self._lock:
+            self.last_used = time.time()
+            self._turns.append((user_message, assistant_message, tokens, question or user_message['content']))
+            self._tokens += tokens
+            if self._tokens > self.history_tokens:
+                self._truncate()
+
+    def _truncate(self):
+        """Drop the oldest turns down to half the budget; the caller holds the lock."""
+        while self._turns and self._tokens > self.history_tokens // 2:
+            _, _, tokens, question = self._turns.pop(0)
+            self._tokens -= tokens
+            self._dropped_questions.append(question)
+        # Only the most recent earlier questions that fit the summary budget are kept
+        prefix = "Earlier in this conversation the user asked: "
+        budget = self.summary_tokens * CHARS_PER_TOKEN - len(prefix)
+        kept = 0
+        for question in reversed(self._dropped_questions):
+            budget -= len(question) + 2
+            if budget < 0:
+                break
+            kept += 1
+        self._dropped_questions = self._dropped_questions[len(self._dropped_questions) - kept:]
+        if self._dropped_questions:
+            self._summary = {'role': 'system', 'content': prefix + '; '.join(self._dropped_questions)}
+        else:
+            self._summary = None
+        self.truncations += 1
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._tokens = 0
+            self._dropped_questions.clear()
+            self._summary = None
+
+
+class SessionStore:
+    """
+    Server-side chat sessions by id, dropped after ttl seconds idle and
+    least recently used first beyond max_sessions.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800, history_tokens=1024, summary_tokens=200):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self):
+        session = ChatSession(self.history_tokens, self.summary_tokens)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id):
+        """The live session with this id, or None."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self.ttl and time.time() - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_used = time.time()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id=None):
+        """The session with this id, or a new one if there is none (any more)."""
+        session = self.get(session_id) if session_id else None
+        return session or self.create()
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        """Drop idle sessions, oldest first; the caller holds the lock."""
+        if not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'history_tokens': self.history_tokens,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
@@ -9,7 +9,7 @@ import sys
 import subprocess
 import readline
 import argparse
-from utils import run_ollama_model, get_medical_system_prompt, OLLAMA_PATH
+from utils import run_ollama_model, stream_ollama_model, get_medical_system_prompt, sessions, OLLAMA_PATH, ERROR_RESPONSE
 
 # ANSI color codes for terminal output
 class Colors:
@@ -78,9 +78,26 @@ def check_ollama_and_model():
     
     return True
 
-def interactive_chat(use_system_prompt=True):
+def print_streamed_response(prompt, system_prompt, session=None):
+    """Print the response as it is generated; Ctrl+C stops the generation but not the session"""
+    parts = []
+    chunks = stream_ollama_model(prompt, system_prompt, session)
+    try:
+        for chunk in chunks:
+            print(chunk, end="", flush=True)
+            parts.append(chunk)
+    except KeyboardInterrupt:
+        print(f"{Colors.YELLOW} [stopped]{Colors.ENDC}", end="")
+    except Exception:
+        print(f"{Colors.RED}{ERROR_RESPONSE}{Colors.ENDC}", end="")
+    finally:
+        chunks.close()
+    return "".join(parts)
+
+def interactive_chat(use_system_prompt=True, stream=False):
     """Run an interactive chat session with the model"""
-    chat_history = []
+    # Earlier turns are sent with each question, within a token budget
+    session = sessions.create()
     system_prompt = get_medical_system_prompt() if use_system_prompt else None
     
     print_header()
@@ -100,24 +117,22 @@ def interactive_chat(use_system_prompt=True):
             if not user_input.strip():
                 continue
             
-            # Add to chat history
-            chat_history.append({"role": "user", "content": user_input})
-            
             # Get model response
             print(f"\n{Colors.BLUE}{Colors.BOLD}Medical Assistant: {Colors.ENDC}", end="")
             sys.stdout.flush()  # Ensure the prompt is displayed immediately
             
-            response = run_ollama_model(user_input, system_prompt)
-            
-            # Print response with a typing effect
-            for char in response:
-                print(char, end="", flush=True)
-                # Adjust the typing speed if needed
+            if stream:
+                # Print tokens as the model produces them
+                response = print_streamed_response(user_input, system_prompt, session)
+            else:
+                response = run_ollama_model(user_input, system_prompt, session)
+                
+                # Print response with a typing effect
+                for char in response:
+                    print(char, end="", flush=True)
+                    # Adjust the typing speed if needed
             
             print("\n")  # Add extra newline after response
-            
-            # Add to chat history
-            chat_history.append({"role": "assistant", "content": response})
     
     except KeyboardInterrupt:
         print(f"\n\n{Colors.BLUE}Session terminated. Thank you for using the Medical Assistant Chatbot.{Colors.ENDC}")
@@ -128,6 +143,7 @@ def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description="Medical Assistant Chatbot CLI")
     parser.add_argument("--no-system-prompt", action="store_true", help="Disable the system prompt")
+    parser.add_argument("--stream", action="store_true", help="Print the response while it is generated")
     return parser.parse_args()
 
 def main():
@@ -141,7 +157,7 @@ def main():
     use_system_prompt = not args.no_system_prompt
     
     # Start interactive chat
-    interactive_chat(use_system_prompt)
+    interactive_chat(use_system_prompt, stream=args.stream)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
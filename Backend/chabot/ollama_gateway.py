@@ -0,0 +1,255 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import queue
+import threading
+import time
+
+import httpx
+from ollama import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Model is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ChatStream:
+    """
+    Blocking iterator over a streaming generation running on the gateway loop.
+
+    close() is safe to call at any point, including before the first chunk,
+    more than once and from another thread; it cancels the generation and
+    frees the admission.
+    """
+
+    def __init__(self, future, chunks, on_close):
+        self._future = future
+        self._chunks = chunks
+        self._on_close = on_close
+        self._close_lock = threading.Lock()
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        chunk = self._chunks.get()
+        if chunk is _END:
+            self.close()
+            raise StopIteration
+        if isinstance(chunk, BaseException):
+            self.close()
+            raise chunk
+        return chunk
+
+    def close(self):
+        """Cancel the generation; may be called from another thread than the reader's."""
+        with self._close_lock:
+            if self.closed:
+                return
+            self.closed = True
+        self._future.cancel()
+        # Wake a reader blocked on the queue, also if the coroutine never got to run
+        self._chunks.put(_END)
+        self._on_close()
+
+
+class OllamaGateway:
+    """
+    Shared, bounded access to the Ollama server.
+
+    One asyncio event loop on a background thread owns a single AsyncClient,
+    whose httpx connection pool keeps connections to Ollama alive between
+    requests. At most max_concurrency generations run at once and at most
+    max_queue more wait for a slot; anything beyond that is rejected
+    immediately with Overloaded, as is a request that waited queue_timeout
+    seconds without getting a slot. Request threads block only on their own
+    result, never on connection setup or on each other.
+    """
+
+    def __init__(self, host='http://localhost:11434', max_concurrency=2, max_queue=8,
+                 queue_timeout=30.0, request_timeout=120.0):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+
+        self.admitted = 0  # running + waiting
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0  # streams closed by the caller before the end
+        self._mean_seconds = None  # moving average generation time, for retry hints
+        self._lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='ollama-gateway', daemon=True)
+        self._thread.start()
+        self._semaphore = None
+        self._client = asyncio.run_coroutine_threadsafe(self._create_client(), self._loop).result()
+
+    async def _create_client(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        return AsyncClient(host=self.host, timeout=self.request_timeout, limits=limits)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the queue length and average generation time."""
+        mean = self._mean_seconds or 5.0
+        ahead = max(self.admitted - self.max_concurrency + 1, 1)
+        return max(1, math.ceil(mean * ahead / self.max_concurrency))
+
+    def _admit(self):
+        with self._lock:
+            if self.admitted >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.admitted += 1
+
+    def _leave(self):
+        with self._lock:
+            self.admitted -= 1
+
+    def _record(self, seconds, ok):
+        with self._lock:
+            if ok:
+                self.completed += 1
+                self._mean_seconds = seconds if self._mean_seconds is None else 0.8 * self._mean_seconds + 0.2 * seconds
+            else:
+                self.failed += 1
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(self.retry_after())
+        with self._lock:
+            self.running += 1
+
+    def _release(self):
+        with self._lock:
+            self.running -= 1
+        self._semaphore.release()
+
+    async def _chat(self, kwargs):
+        await self._acquire()
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self._client.chat(**kwargs)
+            ok = True
+            return response
+        finally:
+            self._release()
+            self._record(time.perf_counter() - started, ok)
+
+    def chat(self, **kwargs):
+        """
+        Blocking chat call through the shared client; takes ollama chat() arguments.
+
+        Raises:
+            Overloaded: The concurrency limit and wait queue are full, or no
+                slot freed up within queue_timeout
+        """
+        self._admit()
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._chat(kwargs), self._loop)
+            try:
+                return future.result()
+            except BaseException:
+                # e.g. KeyboardInterrupt in the CLI: stop the upstream request too
+                future.cancel()
+                raise
+        finally:
+            self._leave()
+
+    async def _stream(self, kwargs, chunks, slot):
+        ok = False
+        try:
+            await self._acquire()
+        except Overloaded as e:
+            slot.set_exception(e)
+            return
+        slot.set_result(None)
+
+        started = time.perf_counter()
+        cancelled = False
+        try:
+            async for chunk in await self._client.chat(stream=True, **kwargs):
+                chunks.put(chunk)
+            ok = True
+        except asyncio.CancelledError:
+            # Closing the response stream makes Ollama stop generating
+            cancelled = True
+            raise
+        except BaseException as e:
+            chunks.put(e)
+            raise
+        finally:
+            self._release()
+            if cancelled:
+                with self._lock:
+                    self.cancelled += 1
+            else:
+                self._record(time.perf_counter() - started, ok)
+            chunks.put(_END)
+
+    def stream_chat(self, **kwargs):
+        """
+        Streaming chat call; takes ollama chat() arguments.
+
+        Blocks until the generation has a concurrency slot, so Overloaded
+        (a full queue, or no slot within queue_timeout) is raised by this
+        call, before any response is sent, rather than on the first chunk.
+        Closing the returned iterator (for example when the HTTP client
+        disconnects) cancels the upstream generation.
+
+        Returns:
+            iterator: Response chunks as Ollama sends them
+        """
+        self._admit()
+        chunks = queue.Queue()
+        slot = concurrent.futures.Future()
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._stream(kwargs, chunks, slot), self._loop)
+            # Also wakes the wait below if the coroutine ends without deciding, e.g. cancelled at shutdown
+            future.add_done_callback(lambda _: slot.cancel())
+            try:
+                slot.result()
+            except BaseException:
+                future.cancel()
+                raise
+        except BaseException:
+            self._leave()
+            raise
+        return ChatStream(future, chunks, self._leave)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'waiting': max(self.admitted - self.running, 0),  # a cancelled call leaves before it releases
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'mean_generation_seconds': round(self._mean_seconds, 3) if self._mean_seconds else None
+            }
@@ -0,0 +1,236 @@
+import re
+from collections import namedtuple
+
+# Common medications by name
+MEDICATIONS = (
+    'crocin', 'paracetamol', 'aspirin', 'ibuprofen', 'acetaminophen',
+    'amoxicillin', 'omeprazole', 'metformin'
+)
+
+# Medical-related keywords; a message containing any of them (as a substring
+# of the lowercased text) is a medical query
+MEDICAL_KEYWORDS = (
+    # Medications and Treatments
+    'medicine', 'drug', 'tablet', 'capsule', 'syrup', 'injection', 'prescription',
+    'dose', 'dosage', 'treatment', 'therapy', 'medication', 'cure', 'vaccine',
+    'antibiotic', 'painkiller', 'inhaler', 'ointment', 'drops',
+
+    # Common Medications
+    *MEDICATIONS,
+
+    # Symptoms and Conditions
+    'pain', 'ache', 'fever', 'cough', 'cold', 'flu', 'infection',
+    'disease', 'condition', 'disorder', 'syndrome', 'inflammation',
+    'swelling', 'rash', 'allergy', 'diabetes', 'asthma', 'arthritis',
+    'migraine', 'diarrhea', 'nausea', 'vomiting',
+
+    # Body Parts and Systems
+    'heart', 'lung', 'liver', 'kidney', 'brain', 'stomach', 'intestine',
+    'muscle', 'bone', 'joint', 'skin', 'blood', 'nerve', 'throat', 'ear',
+    'eye', 'nose', 'mouth', 'teeth', 'gum',
+
+    # Medical Terms
+    'doctor', 'hospital', 'clinic', 'emergency', 'ambulance', 'surgery',
+    'operation', 'examination', 'test', 'scan', 'xray', 'mri', 'ct',
+    'diagnosis', 'prognosis', 'symptom', 'side effect',
+
+    # Health and Wellness
+    'health', 'medical', 'prevention', 'care',
+    'wellness', 'recovery', 'healing', 'immunity', 'vaccination',
+
+    # Mental Health
+    'anxiety', 'depression', 'stress', 'mental health', 'psychiatric',
+    'psychological', 'counseling', 'addiction'
+)
+
+# Medical question patterns, for medical questions without a keyword. They
+# are searched in the lowercased message as before, so the spellings with a
+# capital 'I' never match on their own
+MEDICAL_PATTERNS = (
+    r'how (to|do I|should I) treat',
+    r'what (is|are) the (symptoms|signs|causes|treatments|side effects)',
+    r'(how|when) (to|should I) take',
+    r'(is|are) .* (safe|effective|dangerous)',
+    r'can I take',
+    r'should I see a doctor',
+    r'what does .* (mean|indicate)',
+    r'why (do|does|am I) .* (feel|have|experiencing)',
+    r'(how long|when) (will|does|should)',
+    r'(is|are) .* (normal|serious|dangerous|concerning)',
+    r'(what|how) (is|are) the (risks|benefits|effects)',
+    r'(how|what) (can|should) I do (about|for|to treat)',
+    r'(what|which) medicine',
+    r'(how|what) causes',
+    r'(is|can) .* (contagious|infectious|hereditary)',
+    r'(what|how) (is|are) the (dosage|dose|prescription)',
+    r'(how|what) (is|are) the recommended'
+)
+
+# Answer-format categories in priority order: a message mentioning a
+# medication is a medication query even if it also mentions a symptom
+CATEGORY_KEYWORDS = (
+    ('medication', ('tablet', 'medicine', 'drug', 'dosage', 'crocin', 'prescription')),
+    ('symptom', ('pain', 'ache', 'fever', 'symptoms', 'feeling')),
+    ('treatment', ('treat',))
+)
+
+GENERAL = 'general'
+
+# Follow-up detection: within a conversation, a short message that refers back
+# to it ("is it safe for kids?", "what about at night") is answered in its
+# context even without a medical keyword. Longer or self-contained messages
+# are routed on their own
+FOLLOW_UP_MAX_WORDS = 12
+FOLLOW_UP_REFERENCES = frozenset("""
+    it its itself that this these those they them their he she him her his
+    same else more another instead again also too
+""".split())
+FOLLOW_UP_OPENERS = (('and',), ('but',), ('so',), ('then',), ('also',), ('or',),
+                     ('what', 'about'), ('how', 'about'), ('what', 'if'), ('what', 'else'))
+FOLLOW_UP_REPLIES = frozenset({('why',), ('how',), ('really',), ('why', 'not'), ('how', 'so'), ('how', 'long')})
+
+Route = namedtuple('Route', ['medical', 'category'])
+
+
+def _trie_pattern(words):
+    """
+    Regex source matching any of words, with shared prefixes factored out.
+
+    Each optional suffix is greedy, so the longest word starting at a
+    position wins and the regex engine never backtracks across words.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+def _group_by_first_word(patterns):
+    """
+    Rewrite question patterns as one regex per leading word.
+
+    '(how|what) causes' becomes a 'how ' and a 'what ' alternative, and all
+    alternatives with the same leading word share one regex. Each regex
+    then starts with a literal, which the regex engine finds with a fast
+    substring scan instead of trying every pattern at every position. The
+    rewrite matches exactly the messages the original patterns match.
+    """
+    groups = {}
+    for pattern in patterns:
+        match = re.match(r'\(([\w |]+)\) (.*)', pattern)
+        if match:
+            heads, rest = match.group(1).split('|'), match.group(2)
+        else:
+            head, rest = pattern.split(' ', 1)
+            heads = [head]
+        for head in heads:
+            first, _, more = head.partition(' ')
+            groups.setdefault(first, []).append(f"{more} {rest}" if more else rest)
+    return [re.compile(f"{re.escape(first)} (?:{'|'.join(f'(?:{tail})' for tail in tails)})")
+            for first, tails in groups.items()]
+
+
+class QueryRouter:
+    """
+    Classifies a chat message as medical or not and picks its answer format.
+
+    Every keyword, medical or category, is compiled into one trie-shaped
+    regex inside a lookahead, so a single left-to-right scan in the regex
+    engine finds the keywords starting at every position, overlapping ones
+    included. Each keyword carries a bit mask of what it implies: itself and
+    every shorter keyword it contains ('painkiller' is also 'pain', so also
+    a symptom keyword). The masks of the matches are or-ed together; the
+    scan stops early once the message is known to be a medication query.
+    The question patterns, regrouped into one regex per leading word, only
+    run when no medical keyword was found.
+
+    Matching is by substring of the lowercased message, as before: 'ear'
+    also matches 'year'.
+    """
+
+    MEDICAL = 1
+
+    def __init__(self, keywords=MEDICAL_KEYWORDS, patterns=MEDICAL_PATTERNS, categories=CATEGORY_KEYWORDS):
+        self.categories = [name for name, _ in categories]
+        words = {keyword.lower(): self.MEDICAL for keyword in keywords}
+        for bit, (_, category_words) in enumerate(categories, start=1):
+            for word in category_words:
+                words[word.lower()] = words.get(word.lower(), 0) | (1 << bit)
+
+        # A match of the longest keyword at a position stands for every keyword inside it
+        self._masks = {}
+        for word in words:
+            mask = 0
+            for other, other_mask in words.items():
+                if other in word:
+                    mask |= other_mask
+            self._masks[word] = mask
+
+        self._stop = self.MEDICAL | (1 << 1)  # medical, and the highest priority category
+        self._keywords = re.compile(f'(?=({_trie_pattern(words)}))')
+        self._patterns = _group_by_first_word(patterns)
+
+    def route(self, query):
+        """
+        Classify a message in one pass.
+
+        Args:
+            query (str): The user's message
+
+        Returns:
+            Route: medical (bool) and category ('medication', 'symptom',
+                'treatment' or 'general')
+        """
+        text = query.lower()
+        mask = 0
+        masks = self._masks
+        for match in self._keywords.finditer(text):
+            mask |= masks[match.group(1)]
+            if mask & self._stop == self._stop:
+                break
+
+        medical = bool(mask & self.MEDICAL) or any(pattern.search(text) for pattern in self._patterns)
+        category = GENERAL
+        for bit, name in enumerate(self.categories, start=1):
+            if mask & (1 << bit):
+                category = name
+                break
+        return Route(medical, category)
+
+
+# Compiled once per process and shared by every caller
+ROUTER = QueryRouter()
+
+
+def route_query(query):
+    return ROUTER.route(query)
+
+
+def is_follow_up(query):
+    """
+    Whether a message only makes sense in the conversation before it.
+
+    Args:
+        query (str): The user's message
+
+    Returns:
+        bool: True for a short message that refers back ('it', 'that', ...),
+            continues ('and ...', 'what about ...') or just asks 'why?'
+    """
+    words = tuple(re.findall(r"[a-z]+", query.lower().replace("'", '')))
+    if not words or len(words) > FOLLOW_UP_MAX_WORDS:
+        return False
+    return (words in FOLLOW_UP_REPLIES
+            or any(words[:len(opener)] == opener for opener in FOLLOW_UP_OPENERS)
+            or any(word in FOLLOW_UP_REFERENCES for word in words))
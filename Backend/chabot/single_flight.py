@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """
+    One upstream generation shared by every identical request in flight.
+
+    A pump thread appends the generated chunks to a log; each subscriber
+    replays the log from the start and then follows it, so a request that
+    joins late still gets the whole answer.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.stream = None
+        self.ready = threading.Event()  # set once the upstream call was admitted (or refused)
+        self._changed = threading.Condition()
+
+    def publish(self, chunk):
+        with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+        self.ready.set()
+
+    def chunk(self, position):
+        """
+        Block until the chunk at position exists or the flight is over.
+
+        Returns:
+            str: The chunk, or None at the end of a successful generation
+
+        Raises:
+            Exception: The error the generation failed with
+        """
+        with self._changed:
+            while position >= len(self.chunks) and not self.done:
+                self._changed.wait()
+            if position < len(self.chunks):
+                return self.chunks[position]
+            if self.error is not None:
+                raise self.error
+            return None
+
+
+class Subscription:
+    """
+    A request's view of a shared flight, iterated like the generation itself.
+
+    on_complete(answer, seconds) is called with the full answer once this
+    subscriber has read to the end. close() leaves the flight; when the last
+    subscriber leaves before the end, the generation is cancelled.
+    """
+
+    def __init__(self, group, flight, on_complete=None):
+        self._group = group
+        self._flight = flight
+        self._on_complete = on_complete
+        self._position = 0
+        self._started = time.perf_counter()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            chunk = self._flight.chunk(self._position)
+        except Exception:
+            self.close()
+            raise
+        if chunk is None:
+            if self._on_complete is not None:
+                self._on_complete(''.join(self._flight.chunks), time.perf_counter() - self._started)
+            self.close()
+            raise StopIteration
+        self._position += 1
+        return chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._group._leave(self._flight)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations into one.
+
+    The first request for a key starts the generation; requests for the same
+    key that arrive while it runs subscribe to it instead of starting their
+    own. The generation runs on its own thread, so it keeps going as long as
+    any subscriber is left, whichever of them disconnects. Once it finishes
+    the key is free again.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, start, on_complete=None):
+        """
+        Subscribe to the generation for key, starting it if none is running.
+
+        Args:
+            key: Identity of the request, e.g. (scope, normalized question)
+            start (callable): Starts the generation, returning an iterator of
+                text chunks with a close() method; only called for the first request
+            on_complete (callable, optional): Called as on_complete(answer, seconds)
+                when this subscriber has read the whole answer
+
+        Returns:
+            Subscription: Iterator of text chunks with a close() method
+
+        Raises:
+            Exception: Whatever start() raised, also for requests that joined
+                while it was being called
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight(key)
+                self.started += 1
+            else:
+                self.coalesced += 1
+            flight.subscribers += 1
+
+        if leader:
+            try:
+                flight.stream = start()
+            except Exception as e:
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                flight.finish(e)
+                raise
+            flight.ready.set()
+            threading.Thread(target=self._pump, args=(flight,), name='single-flight', daemon=True).start()
+        else:
+            flight.ready.wait()
+            if flight.stream is None and flight.error is not None:
+                with self._lock:
+                    flight.subscribers -= 1
+                raise flight.error
+
+        return Subscription(self, flight, on_complete)
+
+    def _pump(self, flight):
+        try:
+            for chunk in flight.stream:
+                flight.publish(chunk)
+            flight.finish()
+        except Exception as e:
+            logger.error(f"Shared generation failed: {e}")
+            flight.finish(e)
+        finally:
+            flight.stream.close()
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def _leave(self, flight):
+        with self._lock:
+            flight.subscribers -= 1
+            abandoned = flight.subscribers == 0 and not flight.done
+            if abandoned:
+                self.cancelled += 1
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+        if abandoned and flight.stream is not None:
+            # Nobody is listening any more: stop the generation upstream
+            flight.stream.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'waiting': sum(flight.subscribers for flight in self._flights.values()),
+                'started': self.started,
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled
+            }
@@ -4,6 +4,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const sendButton = document.getElementById('send-button');
     const chatMessages = document.getElementById('chat-messages');
 
+    // Server-side conversation, so follow-up questions keep their context
+    let sessionId = null;
+
     // Function to add a message to the chat
     function addMessage(content, isUser = false) {
         const messageDiv = document.createElement('div');
@@ -35,6 +38,52 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Read server-sent events from the stream endpoint into a bot message.
+    // Returns the message element, or null if nothing was generated.
+    async function streamResponse(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let messageDiv = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                const payload = data ? JSON.parse(data) : {};
+
+                if (event === 'token') {
+                    if (!messageDiv) {
+                        removeTypingIndicator();
+                        addMessage('');
+                        messageDiv = chatMessages.lastElementChild;
+                    }
+                    messageDiv.textContent += payload.content;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'done') {
+                    sessionId = payload.session_id || sessionId;
+                } else if (event === 'error') {
+                    if (!messageDiv) return null;
+                    messageDiv.textContent += `\n\n${payload.response}`;
+                }
+            }
+        }
+        return messageDiv;
+    }
+
     // Handle form submission
     chatForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -53,24 +102,24 @@ document.addEventListener('DOMContentLoaded', () => {
         showTypingIndicator();
 
         try {
-            // Send request to backend
-            const response = await fetch('/api/chat', {
+            // Stream the response so the first words show up while the rest is generated
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ message }),
+                body: JSON.stringify({ message, session_id: sessionId }),
             });
 
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
 
-            const data = await response.json();
-            
-            // Remove typing indicator and add bot response
-            removeTypingIndicator();
-            addMessage(data.response);
+            const messageDiv = await streamResponse(response);
+            if (!messageDiv) {
+                removeTypingIndicator();
+                addMessage('Sorry, I encountered an error. Please try again.');
+            }
 
         } catch (error) {
             console.error('Error:', error);
@@ -1,7 +1,15 @@
 import json
 import logging
+import os
 import re
-from ollama import Client
+import shutil
+import time
+from answer_cache import AnswerCache, normalize_query
+from chat_sessions import SessionStore
+from healthcare_common.metrics import REGISTRY, stage
+from ollama_gateway import OllamaGateway, Overloaded
+from query_router import is_follow_up, route_query
+from single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,8 +18,70 @@ logger = logging.getLogger(__name__)
 # Define the model name
 MODEL_NAME = "llama2-uncensored"
 
-# Initialize Ollama client
-client = Client(host='http://localhost:11434')
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+
+# Ollama binary, used by the CLI to check the installation and pull the model
+OLLAMA_PATH = os.environ.get('OLLAMA_PATH') or shutil.which('ollama') or '/usr/local/bin/ollama'
+
+# Pooled, concurrency-limited access to Ollama for the chat API: at most
+# OLLAMA_MAX_CONCURRENCY generations at once, OLLAMA_MAX_QUEUE more waiting,
+# anything beyond that is rejected with a retry hint
+gateway = OllamaGateway(
+    host=OLLAMA_HOST,
+    max_concurrency=int(os.environ.get('OLLAMA_MAX_CONCURRENCY', 2)),
+    max_queue=int(os.environ.get('OLLAMA_MAX_QUEUE', 8)),
+    queue_timeout=float(os.environ.get('OLLAMA_QUEUE_TIMEOUT', 30)),
+    request_timeout=float(os.environ.get('OLLAMA_REQUEST_TIMEOUT', 120))
+)
+REGISTRY.register_stats('ollama_gateway', gateway.stats,
+                        counters=('completed', 'failed', 'rejected', 'cancelled'),
+                        gauges=('running', 'waiting', 'max_concurrency', 'max_queue', 'mean_generation_seconds'))
+
+# Answers to repeated questions, see answer_cache.py. CHAT_CACHE_SIZE=0
+# disables it, CHAT_CACHE_PATH keeps it across restarts, and
+# CHAT_CACHE_SIMILARITY below 1 (e.g. 0.85) opts in to near-duplicate matching
+answer_cache = AnswerCache(
+    maxsize=int(os.environ.get('CHAT_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('CHAT_CACHE_TTL', 24 * 3600)),
+    similarity=float(os.environ.get('CHAT_CACHE_SIMILARITY', 1.0)),
+    path=os.environ.get('CHAT_CACHE_PATH') or None
+)
+REGISTRY.register_stats('chat_answer_cache', answer_cache.stats,
+                        counters=('hits', 'near_hits', 'misses', 'evictions', 'saved_seconds'),
+                        gauges=('size', 'hit_ratio'))
+
+# Model server settings sent with every request. Keeping the model loaded
+# (OLLAMA_KEEP_ALIVE) and the context size fixed (OLLAMA_NUM_CTX, 0 for the
+# server default; changing it reloads the model) lets Ollama reuse the
+# already processed system prompt and conversation prefix between calls
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_NUM_CTX = int(os.environ.get('OLLAMA_NUM_CTX', 0))
+
+# Server-side conversations: the last CHAT_HISTORY_TOKENS (approximate) of
+# each session are sent with a follow-up question (query_router.is_follow_up),
+# see chat_sessions.py
+sessions = SessionStore(
+    max_sessions=int(os.environ.get('CHAT_MAX_SESSIONS', 1000)),
+    ttl=float(os.environ.get('CHAT_SESSION_TTL', 1800)),
+    history_tokens=int(os.environ.get('CHAT_HISTORY_TOKENS', 1024)),
+    summary_tokens=int(os.environ.get('CHAT_SUMMARY_TOKENS', 200))
+)
+REGISTRY.register_stats('chat_sessions', sessions.stats,
+                        counters=('created', 'expired', 'evicted'), gauges=('sessions',))
+
+# Identical questions asked at the same time share one generation
+flights = SingleFlight()
+REGISTRY.register_stats('chat_single_flight', flights.stats,
+                        counters=('started', 'coalesced', 'cancelled'), gauges=('in_flight', 'waiting'))
+
+# Chat traffic counters for /metrics
+CHAT_QUERIES = REGISTRY.counter('chat_queries_total', 'Chat queries by routing result', ('kind',))
+OLLAMA_ERRORS = REGISTRY.counter('ollama_errors_total', 'Failed Ollama chat calls')
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram('chat_time_to_first_token_seconds',
+                                         'Time from a streaming request to its first generated token')
+
+NON_MEDICAL_RESPONSE = "I am a medical assistant and can only answer health-related questions. Please ask me something about health, medicine, or medical conditions."
+ERROR_RESPONSE = "Sorry, there was an error processing your request. Please try again."
 
 def is_medical_query(query):
     """
@@ -23,154 +93,201 @@ def is_medical_query(query):
     Returns:
         bool: True if the query is medical-related, False otherwise
     """
-    # List of medical-related keywords and patterns
-    medical_keywords = {
-        # Medications and Treatments
-        'medicine', 'drug', 'tablet', 'capsule', 'syrup', 'injection', 'prescription',
-        'dose', 'dosage', 'treatment', 'therapy', 'medication', 'cure', 'vaccine',
-        'antibiotic', 'painkiller', 'inhaler', 'ointment', 'drops',
-        
-        # Common Medications
-        'crocin', 'paracetamol', 'aspirin', 'ibuprofen', 'acetaminophen',
-        'amoxicillin', 'omeprazole', 'metformin',
-        
-        # Symptoms and Conditions
-        'pain', 'ache', 'fever', 'cough', 'cold', 'flu', 'infection',
-        'disease', 'condition', 'disorder', 'syndrome', 'inflammation',
-        'swelling', 'rash', 'allergy', 'diabetes', 'asthma', 'arthritis',
-        'migraine', 'diarrhea', 'nausea', 'vomiting',
-        
-        # Body Parts and Systems
-        'heart', 'lung', 'liver', 'kidney', 'brain', 'stomach', 'intestine',
-        'muscle', 'bone', 'joint', 'skin', 'blood', 'nerve', 'throat', 'ear',
-        'eye', 'nose', 'mouth', 'teeth', 'gum',
-        
-        # Medical Terms
-        'doctor', 'hospital', 'clinic', 'emergency', 'ambulance', 'surgery',
-        'operation', 'examination', 'test', 'scan', 'xray', 'mri', 'ct',
-        'diagnosis', 'prognosis', 'symptom', 'side effect',
+    return route_query(query).medical
+
+# Answer format for each routing category; 'general' queries get only the system prompt
+CATEGORY_PROMPTS = {
+    'medication': """Provide a BRIEF response about the medication:
+    • Generic/Brand name (if asked)
+    • Specific dosage (if asked)
+    • Direct answer to the question
+    • Critical warnings (if relevant)
+    Keep it under 100 words.""",
+    'symptom': """Provide a BRIEF response about the symptoms:
+    • Direct answer to the specific question
+    • Immediate actions to take
+    • When to seek medical help (if urgent)
+    Keep it under 100 words.""",
+    'treatment': """Provide a BRIEF treatment response:
+    • Direct treatment steps
+    • Important precautions
+    • When to see a doctor (if needed)
+    Keep it under 100 words."""
+}
+
+def query_category(prompt):
+    """
+    Route a medical query to an answer format.
+    
+    Args:
+        prompt (str): The user query
         
-        # Health and Wellness
-        'health', 'medical', 'disease', 'prevention', 'treatment', 'care',
-        'wellness', 'recovery', 'healing', 'immunity', 'vaccination',
+    Returns:
+        str: 'medication', 'symptom', 'treatment' or 'general'
+    """
+    return route_query(prompt).category
+
+def build_messages(prompt, system_prompt=None, category=None, history=None):
+    """
+    Build the chat messages for a medical query: the system prompt, the
+    category's answer format and the user's question. Shared by the
+    blocking and streaming paths so both get the same instructions.
+    
+    With a session history the earlier turns follow the system prompt and
+    the answer format goes into the new user message rather than a second
+    system message. Everything before a follow-up is then exactly the
+    previous follow-up's request plus its answer, which the model server
+    can reuse from its cache.
+    
+    Args:
+        prompt (str): The user query
+        system_prompt (str, optional): A system prompt to guide the model's behavior
+        category (str, optional): From query_category(), computed if not given
+        history (list, optional): Earlier messages of the session
         
-        # Mental Health
-        'anxiety', 'depression', 'stress', 'mental health', 'psychiatric',
-        'psychological', 'therapy', 'counseling', 'addiction'
-    }
+    Returns:
+        list: Messages for ollama chat(); the last one is the user message
+    """
+    messages = []
+    if system_prompt:
+        messages.append({
+            'role': 'system',
+            'content': system_prompt
+        })
+    
+    category_prompt = CATEGORY_PROMPTS.get(category or query_category(prompt))
+    question = f"Provide a brief, direct answer to: {prompt}"
+    if history is None:
+        if category_prompt:
+            messages.append({
+                'role': 'system',
+                'content': category_prompt
+            })
+    else:
+        messages.extend(history)
+        if category_prompt:
+            question = f"{category_prompt}\n\n{question}"
     
-    # Medical question patterns
-    medical_patterns = [
-        r'how (to|do I|should I) treat',
-        r'what (is|are) the (symptoms|signs|causes|treatments|side effects)',
-        r'(how|when) (to|should I) take',
-        r'(is|are) .* (safe|effective|dangerous)',
-        r'can I take',
-        r'should I see a doctor',
-        r'what does .* (mean|indicate)',
-        r'why (do|does|am I) .* (feel|have|experiencing)',
-        r'(how long|when) (will|does|should)',
-        r'(is|are) .* (normal|serious|dangerous|concerning)',
-        r'(what|how) (is|are) the (risks|benefits|effects)',
-        r'(how|what) (can|should) I do (about|for|to treat)',
-        r'(what|which) medicine',
-        r'(how|what) causes',
-        r'(is|can) .* (contagious|infectious|hereditary)',
-        r'(what|how) (is|are) the (dosage|dose|prescription)',
-        r'(how|what) (is|are) the recommended'
-    ]
-
-    query_lower = query.lower()
+    messages.append({
+        'role': 'user',
+        'content': question
+    })
     
-    # Check medical patterns
-    for pattern in medical_patterns:
-        if re.search(pattern, query_lower):
-            return True
+    return messages
+
+def chat_arguments(messages):
+    """Keyword arguments for an Ollama chat call, with the keep-alive and context settings."""
+    kwargs = {'model': MODEL_NAME, 'messages': messages}
+    if OLLAMA_KEEP_ALIVE:
+        kwargs['keep_alive'] = OLLAMA_KEEP_ALIVE
+    if OLLAMA_NUM_CTX:
+        kwargs['options'] = {'num_ctx': OLLAMA_NUM_CTX}
+    return kwargs
+
+def _route(prompt, session):
+    """
+    Route a message and count it.
     
-    # Check for medical keywords
-    words = set(re.findall(r'\w+', query_lower))
-    if any(keyword.lower() in words or keyword.lower() in query_lower for keyword in medical_keywords):
-        return True
+    The router decides whether a message is answered. The only exception
+    is a short message that refers back to an earlier turn of the session
+    ("is it safe for kids?"), which is answered in that context.
     
-    return False
+    Returns:
+        tuple: (medical, follow_up, category); follow_up is True for a
+            context-dependent message in a session that has history
+    """
+    with stage('classify_query'):
+        medical, category = route_query(prompt)
+        follow_up = session is not None and session.has_history() and is_follow_up(prompt)
+    medical = medical or follow_up
+    CHAT_QUERIES.inc(kind='medical' if medical else 'non_medical')
+    return medical, follow_up, category
 
-def run_ollama_model(prompt, system_prompt=None):
+def run_ollama_model(prompt, system_prompt=None, session=None):
     """
     Query the Ollama model with enhanced medical context.
-    Only processes medical-related queries.
+    Only processes medical-related queries; within a session that already
+    has history, short follow-ups are answered in its context. Standalone
+    questions are answered (and cached) without the history, but are still
+    recorded in the session.
     
     Args:
         prompt (str): The user query
         system_prompt (str, optional): A system prompt to guide the model's behavior
+        session (ChatSession, optional): Conversation to continue and record the turn in
         
     Returns:
         str: The model's response
+
+    Raises:
+        Overloaded: Too many requests are already running or waiting
     """
-    # First check if it's a medical query
-    if not is_medical_query(prompt):
-        return "I am a medical assistant and can only answer health-related questions. Please ask me something about health, medicine, or medical conditions."
+    # First check if it's a medical query, and which answer format it needs
+    medical, follow_up, category = _route(prompt, session)
+    if not medical:
+        return NON_MEDICAL_RESPONSE
     
+    # Only a follow-up is sent with the history: the answer to a standalone
+    # question does not depend on the session, so it can be cached and shared
+    messages = build_messages(prompt, system_prompt, category,
+                              session.history() if follow_up else None)
+    
+    # Repeated questions are answered from the cache without a generation;
+    # a follow-up depends on its conversation, so it is never cached
+    scope = AnswerCache.scope(MODEL_NAME, category, system_prompt)
+    if not follow_up:
+        with stage('answer_cache'):
+            cached = answer_cache.get(prompt, scope)
+        if cached is not None:
+            if session is not None:
+                session.add_turn(messages[-1], cached, prompt)
+            return cached
+
     try:
-        # Construct the messages
-        messages = []
-        if system_prompt:
-            messages.append({
-                'role': 'system',
-                'content': system_prompt
-            })
-        
-        # Add specific context for medication queries
-        if any(med in prompt.lower() for med in ['tablet', 'medicine', 'drug', 'dosage', 'crocin', 'prescription']):
-            medication_prompt = """Provide a BRIEF response about the medication:
-            • Generic/Brand name (if asked)
-            • Specific dosage (if asked)
-            • Direct answer to the question
-            • Critical warnings (if relevant)
-            Keep it under 100 words."""
-            
-            messages.append({
-                'role': 'system',
-                'content': medication_prompt
-            })
-        
-        # Add specific context for symptom queries
-        elif any(symptom in prompt.lower() for symptom in ['pain', 'ache', 'fever', 'symptoms', 'feeling']):
-            symptom_prompt = """Provide a BRIEF response about the symptoms:
-            • Direct answer to the specific question
-            • Immediate actions to take
-            • When to seek medical help (if urgent)
-            Keep it under 100 words."""
-            
-            messages.append({
-                'role': 'system',
-                'content': symptom_prompt
-            })
-        
-        # Add specific context for treatment queries
-        elif 'treat' in prompt.lower() or 'treatment' in prompt.lower():
-            treatment_prompt = """Provide a BRIEF treatment response:
-            • Direct treatment steps
-            • Important precautions
-            • When to see a doctor (if needed)
-            Keep it under 100 words."""
-            
-            messages.append({
-                'role': 'system',
-                'content': treatment_prompt
-            })
-        
-        messages.append({
-            'role': 'user',
-            'content': f"Provide a brief, direct answer to: {prompt}"
-        })
-        
         # Get response from Ollama
-        response = client.chat(model=MODEL_NAME, messages=messages)
-        return response['message']['content']
+        with stage('ollama'):
+            if follow_up:
+                response = gateway.chat(**chat_arguments(messages))
+                answer = response['message']['content']
+                session.add_turn(messages[-1], answer, prompt)
+            else:
+                shared = _shared_generation(prompt, scope, messages, session)
+                try:
+                    answer = ''.join(shared)
+                finally:
+                    shared.close()
+        return answer
             
+    except Overloaded:
+        raise
     except Exception as e:
+        # A shared generation counts its failure once, in TextStream
+        if follow_up:
+            OLLAMA_ERRORS.inc()
         logger.error(f"Error querying model: {e}")
-        return "Sorry, there was an error processing your request. Please try again."
+        return ERROR_RESPONSE
+
+def _shared_generation(prompt, scope, messages, session=None):
+    """
+    Start the generation for a question, or join the identical one already running.
+    
+    Questions with the same normalized text in the same scope (model,
+    category and system prompt) share one upstream generation whose answer
+    is cached once; every caller records it in its own session.
+    
+    Returns:
+        Subscription: Iterator of text chunks with a close() method
+    """
+    def start():
+        def cache(answer, seconds):
+            answer_cache.put(prompt, scope, answer, seconds)
+        return TextStream(gateway.stream_chat(**chat_arguments(messages)), time.perf_counter(), cache)
+    
+    def record(answer, seconds):
+        if session is not None:
+            session.add_turn(messages[-1], answer, prompt)
+    
+    return flights.join((scope, normalize_query(prompt)), start, record)
 
 def parse_medical_response(response):
     """
@@ -228,42 +345,94 @@ def get_medical_system_prompt():
     End with: "Note: Consult a healthcare provider for medical advice."
     """
 
-def stream_ollama_model(prompt, system_prompt=None):
+def stream_ollama_model(prompt, system_prompt=None, session=None):
     """
     Stream output from the Ollama model.
-    Only processes medical-related queries.
+    Only processes medical-related queries, with the same routing and
+    prompts as run_ollama_model.
+    
+    Routing and admission happen before this returns, so an overloaded
+    server is reported right away rather than in the middle of a stream.
+    Closing the returned iterator cancels the generation, unless other
+    requests for the same question are still reading it.
     
     Args:
         prompt (str): The user query
         system_prompt (str, optional): A system prompt to guide the model's behavior
+        session (ChatSession, optional): Conversation to continue; the turn is
+            recorded once the answer has been read to the end
         
-    Yields:
-        str: Chunks of the model's response
+    Returns:
+        iterator: Chunks of the model's response, with a close() method;
+            iterating raises if the generation fails part way
+
+    Raises:
+        Overloaded: Too many requests are already running or waiting
     """
-    # Check if the query is medical-related
-    if not is_medical_query(prompt):
-        yield "I'm a medical assistant and can only answer health-related questions. Please ask me something about health, medicine, or wellness."
-        return
+    medical, follow_up, category = _route(prompt, session)
+    if not medical:
+        return (text for text in (NON_MEDICAL_RESPONSE,))
     
-    try:
-        # Construct the messages
-        messages = []
-        if system_prompt:
-            messages.append({
-                'role': 'system',
-                'content': system_prompt
-            })
-        
-        messages.append({
-            'role': 'user',
-            'content': prompt
-        })
-        
-        # Stream response from Ollama
-        for chunk in client.chat(model=MODEL_NAME, messages=messages, stream=True):
-            if 'message' in chunk and 'content' in chunk['message']:
-                yield chunk['message']['content']
-                
-    except Exception as e:
-        logger.error(f"Error streaming from model: {e}")
-        yield "Sorry, there was an error processing your request." 
\ No newline at end of file
+    messages = build_messages(prompt, system_prompt, category,
+                              session.history() if follow_up else None)
+    
+    scope = AnswerCache.scope(MODEL_NAME, category, system_prompt)
+    if not follow_up:
+        with stage('answer_cache'):
+            cached = answer_cache.get(prompt, scope)
+        if cached is not None:
+            if session is not None:
+                session.add_turn(messages[-1], cached, prompt)
+            return (text for text in (cached,))
+    
+    if not follow_up:
+        return _shared_generation(prompt, scope, messages, session)
+    
+    def on_complete(answer, seconds):
+        session.add_turn(messages[-1], answer, prompt)
+    
+    return TextStream(gateway.stream_chat(**chat_arguments(messages)), time.perf_counter(), on_complete)
+
+class TextStream:
+    """
+    Iterator over the text of a streamed chat response; close() cancels the generation.
+
+    on_complete(answer, seconds) is called with the full text once the
+    stream has been read to the end, not when it is closed early.
+    """
+
+    def __init__(self, chunks, started, on_complete=None):
+        self._chunks = chunks
+        self._started = started
+        self._first_token = None
+        self._parts = []
+        self._on_complete = on_complete
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                # A stream that was closed early also stops, but is not complete
+                if self._on_complete is not None and not self._closed:
+                    on_complete, self._on_complete = self._on_complete, None
+                    on_complete(''.join(self._parts), time.perf_counter() - self._started)
+                raise
+            except Exception as e:
+                OLLAMA_ERRORS.inc()
+                logger.error(f"Error streaming from model: {e}")
+                raise
+            if 'message' in chunk and 'content' in chunk['message'] and chunk['message']['content']:
+                if self._first_token is None:
+                    self._first_token = time.perf_counter() - self._started
+                    TIME_TO_FIRST_TOKEN.observe(self._first_token)
+                self._parts.append(chunk['message']['content'])
+                return chunk['message']['content']
+
+    def close(self):
+        self._closed = True
+        self._chunks.close()
@@ -0,0 +1,289 @@
+"""
+In-process request metrics with a Prometheus text endpoint.
+
+Shared by every Python service (Pred_model_final, ai_healthcare and
+chabot), which install it from Backend/common through their requirements:
+
+    from healthcare_common.metrics import REGISTRY, instrument_app, stage
+
+    instrument_app(app)             # request latency, in-flight gauge, GET /metrics
+
+    with stage('decode'):           # per-stage latency within a handler
+        ...
+
+    QUERIES = REGISTRY.counter('queries_total', 'Queries by kind', ('kind',))
+    QUERIES.inc(kind='medical')     # label values are passed by label name
+
+    REGISTRY.register_stats('prediction_cache', prediction_cache.stats,
+                            counters=('hits', 'misses'), gauges=('size',))
+
+Recording is a lock, a bisect and two additions per observation; stats()
+sources are only read when /metrics is scraped. METRICS_ENABLED=0 turns
+stage timers into no-ops and removes the endpoint. With several worker
+processes every worker keeps and reports its own numbers.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def _labelvalues(self, labels):
+        """Label values in labelnames order from keyword arguments."""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple(labels[name] for name in self.labelnames)
+        except KeyError:
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}") from None
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or cache hits."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        labelvalues = self._labelvalues(labels)
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        labelvalues = self._labelvalues(labels)
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(_Metric):
+    """Latency distribution with cumulative buckets, a sum and a count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        labelvalues = self._labelvalues(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), sum
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+
+        lines = self._header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A set of metrics plus stats() sources rendered together on scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._sources = []
+        self._lock = threading.Lock()
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_stats(self, prefix, stats_fn, counters=(), gauges=()):
+        """
+        Export numeric fields of a component's stats() dict at scrape time.
+
+        Args:
+            prefix (str): Metric name prefix, e.g. 'prediction_cache'
+            stats_fn (callable): Returns the stats dict, or None when unavailable
+            counters (tuple): Keys exported as <prefix>_<key>_total counters
+            gauges (tuple): Keys exported as <prefix>_<key> gauges
+        """
+        with self._lock:
+            self._sources.append((prefix, stats_fn, tuple(counters), tuple(gauges)))
+
+    def _render_sources(self):
+        lines = []
+        for prefix, stats_fn, counters, gauges in self._sources:
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue
+            if not stats:
+                continue
+            for keys, kind, suffix in ((counters, 'counter', '_total'), (gauges, 'gauge', '')):
+                for key in keys:
+                    value = stats.get(key)
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    name = f"{prefix}_{key}{suffix}"
+                    lines += [f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+        return lines
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.extend(self._render_sources())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by endpoint',
+    ('endpoint', 'method', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'Requests currently being handled')
+STAGE_SECONDS = REGISTRY.histogram(
+    'stage_duration_seconds', 'Time spent in a named stage of a request handler',
+    ('endpoint', 'stage'))
+
+
+class _StageTimer:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        endpoint = request.endpoint if has_request_context() else 'background'
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, endpoint=endpoint, stage=self.name)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """Context manager timing one stage of the current handler."""
+    return _StageTimer(name) if METRICS_ENABLED else _NULL_TIMER
+
+
+def instrument_app(app, registry=REGISTRY, path='/metrics'):
+    """
+    Record latency and in-flight requests for every route and serve GET path.
+
+    Does nothing when METRICS_ENABLED=0.
+    """
+    if not METRICS_ENABLED:
+        return app
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.get('_metrics_started')
+        if started is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unmatched',
+                                    method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        if g.pop('_metrics_started', None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
+
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule(path, 'metrics', metrics, methods=['GET'])
+    return app